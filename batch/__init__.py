@@ -0,0 +1 @@
+from batch.run import main
@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import fe.run
+import preprocessing.run
+from utils.frames import COLUMNS_SUFFIX
+from utils.parse import BaseArgs, get_base_parser
+
+INPUT_PATH = "data/"
+OUTPUT_PATH = "output/"
+
+PREPROCESSING_FILE = os.path.join("data", "preprocessing")
+FE_FILE = os.path.join("data", "feature_engineering")
+
+
+@dataclass
+class Args(BaseArgs):
+    workers: int
+    freq: str
+    chunksize: int | None
+    store: bool
+    skip_fe: bool
+    force: bool
+    columnar: bool
+
+
+@dataclass
+class ExperimentResult:
+    name: str
+    status: str = "done"
+    timings: dict[str, float] = field(default_factory=dict)
+    error: str | None = None
+
+
+def parse_args(args: list[str]) -> Args:
+    base_parser = get_base_parser(
+        INPUT_PATH,
+        OUTPUT_PATH,
+        "Directory searched for experiment directories",
+        "Directory the outputs of every experiment go to",
+    )
+    parser = argparse.ArgumentParser(
+        prog="batch",
+        description="Preprocessing and feature engineering of every experiment under INPUT_PATH, results go to OUTPUT_PATH/<experiment>/data/.",
+        parents=[base_parser],
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Number of experiments processed at once, each one holds its own data in memory (default %(default)s).",
+        default=1,
+    )
+    parser.add_argument(
+        "-f",
+        "--freq",
+        type=str,
+        help="Frequency to be used to aggregate the data in miliseconds (default %(default)s).",
+        default="1000",
+    )
+    parser.add_argument(
+        "-c",
+        "--chunksize",
+        type=int,
+        help="Stream the raw files in chunks of this many rows, bounding the memory of every worker (default %(default)s).",
+        default=None,
+    )
+    parser.add_argument(
+        "-s",
+        "--store",
+        action="store_true",
+        help="Read the sensors from the store of every experiment, when it has one.",
+    )
+    parser.add_argument(
+        "--skip-fe",
+        action="store_true",
+        help="Just run preprocessing.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Process experiments even if their outputs are up to date.",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help=f"Hand data over between stages as columnar frames ({COLUMNS_SUFFIX}) instead of CSV.",
+    )
+
+    arguments = parser.parse_args(args)
+    return Args(
+        arguments.input,
+        arguments.output,
+        arguments.workers,
+        arguments.freq,
+        arguments.chunksize,
+        arguments.store,
+        arguments.skip_fe,
+        arguments.force,
+        arguments.columnar,
+    )
+
+
+def discover_experiments(root: str) -> list[str]:
+    """Directories under `root` holding an experiment, i.e. with a `meta/time.csv`"""
+    res = []
+    for dirpath, dirnames, _ in os.walk(root):
+        if os.path.exists(os.path.join(dirpath, "meta", "time.csv")):
+            res.append(dirpath)
+            # Don't look for experiments inside an experiment
+            dirnames.clear()
+    return sorted(res)
+
+
+def newest_mtime(path: str) -> float:
+    return max(
+        (
+            os.path.getmtime(os.path.join(dirpath, filename))
+            for dirpath, _, filenames in os.walk(path)
+            for filename in filenames
+        ),
+        default=0.0,
+    )
+
+
+def options_path(output: str) -> str:
+    return f"{output}.options.json"
+
+
+def write_options(output: str, options: list[str]) -> None:
+    """Keep the options `output` was made with, for `is_up_to_date`"""
+    with open(options_path(output), "w") as f:
+        json.dump(options, f)
+
+
+def is_up_to_date(output: str, input_mtime: float, options: list[str]) -> bool:
+    """
+    Whether `output` is newer than its input and was made with the same
+    `options`, which rules out outputs from before the options were kept
+    """
+    if not os.path.exists(output) or os.path.getmtime(output) < input_mtime:
+        return False
+    try:
+        with open(options_path(output)) as f:
+            return json.load(f) == options
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+
+
+def process_experiment(experiment: str, output: str, args: Args) -> ExperimentResult:
+    # Module level so it can be sent to worker processes
+    result = ExperimentResult(name=os.path.relpath(experiment, args.input))
+    suffix = COLUMNS_SUFFIX if args.columnar else ".csv"
+    preprocessing_output = os.path.join(output, PREPROCESSING_FILE + suffix)
+    fe_output = os.path.join(output, FE_FILE + suffix)
+    os.makedirs(os.path.dirname(preprocessing_output), exist_ok=True)
+
+    # Options that change the outputs, chunked and store reads give the same
+    preprocessing_options = ["-f", args.freq]
+    fe_options = []
+
+    try:
+        if args.force or not is_up_to_date(
+            preprocessing_output, newest_mtime(experiment), preprocessing_options
+        ):
+            preprocessing_args = ["-i", experiment, "-o", preprocessing_output]
+            preprocessing_args += preprocessing_options
+            if args.chunksize is not None:
+                preprocessing_args += ["-c", str(args.chunksize)]
+            if args.store:
+                preprocessing_args += ["-s"]
+            start = time.perf_counter()
+            preprocessing.run.run(preprocessing.run.parse_args(preprocessing_args))
+            write_options(preprocessing_output, preprocessing_options)
+            result.timings["preprocessing"] = time.perf_counter() - start
+
+        if not args.skip_fe and (
+            args.force
+            or not is_up_to_date(
+                fe_output, os.path.getmtime(preprocessing_output), fe_options
+            )
+        ):
+            fe_args = ["-i", preprocessing_output, "-o", fe_output, *fe_options]
+            start = time.perf_counter()
+            fe.run.run(fe.run.parse_args(fe_args))
+            write_options(fe_output, fe_options)
+            result.timings["fe"] = time.perf_counter() - start
+    except Exception:
+        result.status = "failed"
+        result.error = traceback.format_exc()
+        return result
+
+    if not result.timings:
+        result.status = "skipped"
+    return result
+
+
+def print_summary(results: list[ExperimentResult]) -> None:
+    print("\nSummary:")
+    width = max(len(result.name) for result in results)
+    for result in sorted(results, key=lambda x: x.name):
+        timings = ", ".join(
+            f"{step}: {seconds:.2f}s" for step, seconds in result.timings.items()
+        )
+        print(f"    {result.name:<{width}}  {result.status:<7}  {timings}")
+    total = sum(sum(result.timings.values()) for result in results)
+    print(f"    Total time spent on experiments: {total:.2f}s")
+    for result in results:
+        if result.error is not None:
+            print(f"\n{result.name} failed with:\n{result.error}")
+
+
+def run(args: Args) -> list[ExperimentResult]:
+    experiments = discover_experiments(str(args.input))
+    print(f"Found {len(experiments)} experiments in {args.input}")
+    if not experiments:
+        return []
+
+    outputs = [
+        os.path.join(args.output, os.path.relpath(experiment, args.input))
+        for experiment in experiments
+    ]
+    if args.workers <= 1:
+        results = [
+            process_experiment(experiment, output, args)
+            for experiment, output in zip(experiments, outputs)
+        ]
+    else:
+        # A fresh process per experiment gives its memory back once it's done
+        with ProcessPoolExecutor(
+            max_workers=args.workers, max_tasks_per_child=1
+        ) as pool:
+            futures = [
+                pool.submit(process_experiment, experiment, output, args)
+                for experiment, output in zip(experiments, outputs)
+            ]
+            results = [future.result() for future in as_completed(futures)]
+
+    print_summary(results)
+    return results
+
+
+def main(args: list[str]) -> None:
+    run(parse_args(args))
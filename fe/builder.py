@@ -0,0 +1,59 @@
+from typing import Hashable
+
+import numpy as np
+import pandas as pd
+
+__all__ = ("FeatureMatrix",)
+
+
+class FeatureMatrix:
+    """
+    Features allocated up front in one contiguous block, from a `schema`
+    mapping every part (f.e. a feature family) to its columns. Each part
+    writes into its own slice of columns, `matrix[part]`, and the frame is
+    built on top of the block without copying it
+    """
+
+    def __init__(
+        self,
+        n_rows: int,
+        schema: dict[Hashable, list[str]],
+        dtype: type = np.float64,
+    ) -> None:
+        self.schema = schema
+        self.columns = [column for columns in schema.values() for column in columns]
+        self.block = np.empty((n_rows, len(self.columns)), dtype=dtype)
+
+        self._slices = {}
+        offset = 0
+        for part, columns in schema.items():
+            self._slices[part] = slice(offset, offset + len(columns))
+            offset += len(columns)
+
+    def __getitem__(self, part: Hashable) -> np.ndarray:
+        return self.block[:, self._slices[part]]
+
+    def valid_rows(self, keep: np.ndarray | None = None) -> slice | np.ndarray:
+        """
+        Rows without any NaN (and in the boolean mask `keep`, if given). These
+        usually are all but the first ones (the warm up of the windows), then
+        given as a slice so that taking them is still a view of the block
+        """
+        valid = ~np.isnan(self.block).any(axis=1)
+        if keep is not None:
+            valid &= keep
+        (rows,) = np.nonzero(valid)
+        if len(rows) == 0:
+            return slice(0, 0)
+        if rows[-1] - rows[0] + 1 == len(rows):
+            return slice(rows[0], rows[-1] + 1)
+        return rows
+
+    def to_frame(
+        self, rows: slice | np.ndarray = slice(None), index: pd.Index | None = None
+    ) -> pd.DataFrame:
+        if index is None:
+            index = pd.RangeIndex(len(self.block))
+        return pd.DataFrame(
+            self.block[rows], index=index[rows], columns=self.columns, copy=False
+        )
@@ -1,9 +1,12 @@
 import re
+from functools import lru_cache, partial
+from typing import Callable, Iterable
 
 import numpy as np
 import pandas as pd
-from scipy.signal import butter, filtfilt
-from sklearn.decomposition import PCA
+from scipy.signal import butter, sosfiltfilt
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.pipeline import Pipeline, make_pipeline
 from sklearn.preprocessing import StandardScaler
 
 from fe.config import (
@@ -11,6 +14,8 @@ from fe.config import (
     CENTRALITY_WINDOW_SIZES,
     CUTOFF_FREQUENCIES,
 )
+from fe.builder import FeatureMatrix
+from fe.rolling import rolling_dominant_frequency, rolling_statistics
 
 # from sklearn.cluster import KMeans, AgglomerativeClustering, SpectralClustering
 # from scipy.cluster.hierarchy import dendrogram, linkage, fcluster
@@ -19,10 +24,21 @@ from fe.config import (
 
 
 __all__ = (
+    "COLUMNWISE_FAMILIES",
+    "FEATURE_FAMILIES",
     "add_centrality_window",
     "add_dominant_frequencies",
     "add_pca",
     "add_signal_cutoff",
+    "centrality_window_columns",
+    "centrality_window_features",
+    "dominant_frequency_columns",
+    "dominant_frequency_features",
+    "fit_pca",
+    "pca_columns",
+    "pca_features",
+    "signal_cutoff_columns",
+    "signal_cutoff_features",
 )
 
 # def gower_distance(df: pd.DataFrame):
@@ -60,90 +76,209 @@ def get_fun_name(fun) -> str:
     return re.findall(r"function (\w*) at", str(fun)).pop()
 
 
-def butterworth_filter(data, cutoff, fs, order=4):
+@lru_cache
+def butterworth_sos(cutoff, fs, order=4) -> np.ndarray:
+    """Low pass Butterworth filter as second order sections, designed once"""
     nyquist = 0.5 * fs
     normal_cutoff = cutoff / nyquist
-    b, a = butter(order, normal_cutoff, btype="low", analog=False)
-    y = filtfilt(b, a, data)
+    return butter(order, normal_cutoff, btype="low", analog=False, output="sos")
+
+
+def butterworth_filter(data, cutoff, fs, order=4):
+    """Zero phase low pass of `data`, every column at once if it's 2-D"""
+    sos = butterworth_sos(cutoff, fs, order)
+    y = sosfiltfilt(sos, data, axis=0)
     return y
 
 
-def add_pca(
-    df: pd.DataFrame, feature_columns: list[str], n_components: int = 15
-) -> pd.DataFrame:
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(df[feature_columns])
+def pca_columns(sizes: Iterable[int]) -> list[str]:
+    return [f"pca_{size}_component_{i+1}" for size in sizes for i in range(size)]
+
+
+def centrality_window_columns(feature_columns: list[str], window: int) -> list[str]:
+    return [
+        f"{column}_{get_fun_name(fun)}_{window}"
+        for column in feature_columns
+        for fun in CENTRALITY_WINDOW_FUNS
+    ]
+
+
+def dominant_frequency_columns(feature_columns: list[str], window: int) -> list[str]:
+    return [f"{column}_dominant_freq_{window}" for column in feature_columns]
+
 
-    # Apply PCA
-    pca = PCA(n_components=n_components)
-    pca_components = pca.fit_transform(scaled_features)
+def signal_cutoff_columns(feature_columns: list[str], cutoff: float) -> list[str]:
+    return [f"{column}_filtered_{cutoff}Hz" for column in feature_columns]
+
+
+def fit_pca(
+    features: np.ndarray, n_components: int, svd_solver: str = "auto"
+) -> Pipeline:
+    """
+    Standard scaler and PCA fitted on `features`, `svd_solver` is given to
+    `PCA` or "incremental" for an `IncrementalPCA` fitted in batches
+    """
+    if svd_solver == "incremental":
+        pca = IncrementalPCA(n_components=n_components)
+    else:
+        pca = PCA(n_components=n_components, svd_solver=svd_solver, random_state=0)
+    return make_pipeline(StandardScaler(), pca).fit(features)
+
+
+# The functions below write a feature family of the 2-D `features` block
+# (one column per feature column) into `out`, with the columns named by their
+# *_columns counterpart above. `out` can hold just the last rows of
+# `features`, the rows before are then the history these need
+
+
+def pca_features(
+    features: np.ndarray,
+    out: np.ndarray,
+    sizes: Iterable[int],
+    svd_solver: str = "auto",
+    model: Pipeline | None = None,
+) -> None:
+    """
+    First principal components of the (standard scaled) features for every
+    size of `sizes`. The data is scaled and decomposed a single time for the
+    largest one and the rest are sliced from it (components are the same
+    whatever the size asked for).
+
+    The scaler and PCA are fitted on `features` (see `fit_pca`), unless an
+    already fitted `model` is given
+    """
+    sizes = list(sizes)
+    if model is None:
+        model = fit_pca(features, max(sizes), svd_solver)
+    pca_components = model.transform(features[len(features) - len(out) :])
 
-    # Create a DataFrame for the PCA components
-    pca_columns = [f"pca_{n_components}_component_{i+1}" for i in range(n_components)]
-    pca_df = pd.DataFrame(pca_components, columns=pca_columns)
+    offset = 0
+    for size in sizes:
+        out[:, offset : offset + size] = pca_components[:, :size]
+        offset += size
 
-    # Concatenate the PCA components with the original DataFrame
-    df = pd.concat([df, pca_df], axis="columns")
 
-    return df
+def centrality_window_features(
+    features: np.ndarray, out: np.ndarray, window: int
+) -> None:
+    # All functions over all columns from the same windows
+    rolling_statistics(features, window, CENTRALITY_WINDOW_FUNS, out=out)
+
+
+def dominant_frequency_features(
+    features: np.ndarray, out: np.ndarray, window: int, fs: int = 100
+) -> None:
+    rolling_dominant_frequency(features, window, fs, out=out)
+
+
+def signal_cutoff_features(
+    features: np.ndarray, out: np.ndarray, cutoff: float, fs: int = 100
+) -> None:
+    # TODO check if freq ?
+    # Zero phase, every row depends on the whole series
+    out[:] = butterworth_filter(features, cutoff, fs)[len(features) - len(out) :]
+
+
+# Function filling every feature family, called as `fun(features, out, param)`
+FEATURE_FAMILIES = {
+    "pca": pca_features,
+    "centrality_window": centrality_window_features,
+    "dominant_frequency": dominant_frequency_features,
+    "signal_cutoff": signal_cutoff_features,
+}
+
+# Families whose every feature column is computed on its own, so they can be
+# split column by column. The rest (PCA) need all of them at once
+COLUMNWISE_FAMILIES = ("centrality_window", "dominant_frequency", "signal_cutoff")
+
+
+def _concat_features(
+    df: pd.DataFrame, parts: list[tuple[list[str], Callable[[np.ndarray], None]]]
+) -> pd.DataFrame:
+    """Append the features `(columns, fill)` of `parts` to `df` in one block"""
+    matrix = FeatureMatrix(
+        len(df), {i: columns for i, (columns, _) in enumerate(parts)}
+    )
+    for i, (_, fill) in enumerate(parts):
+        fill(matrix[i])
+    return pd.concat([df, matrix.to_frame(index=df.index)], axis="columns")
+
+
+def add_pca(
+    df: pd.DataFrame,
+    feature_columns: list[str],
+    n_components: int | Iterable[int] = 15,
+    svd_solver: str = "auto",
+) -> pd.DataFrame:
+    """
+    Add the first `n_components` principal components of the (standard scaled)
+    feature columns, several sizes can be asked for at once
+    """
+    sizes = [n_components] if isinstance(n_components, int) else list(n_components)
+    features = df[feature_columns].to_numpy(dtype=float)
+    return _concat_features(
+        df,
+        [
+            (
+                pca_columns(sizes),
+                partial(pca_features, features, sizes=sizes, svd_solver=svd_solver),
+            )
+        ],
+    )
 
 
 def add_centrality_window(df: pd.DataFrame, feature_columns: list[str]) -> pd.DataFrame:
     """Add centrality features to the DataFrame
     based on windows sizes
     """
-
-    def rerturn_centrality_window_features(
-        column: pd.Series, window: int
-    ) -> list[pd.Series]:
-        return [
-            pd.Series(
-                column.rolling(window=window).apply(fun),
-                name=f"{column.name}_{get_fun_name(fun)}_{window}",
+    features = df[feature_columns].to_numpy(dtype=float)
+    return _concat_features(
+        df,
+        [
+            (
+                centrality_window_columns(feature_columns, window),
+                partial(centrality_window_features, features, window=window),
             )
-            for fun in CENTRALITY_WINDOW_FUNS
-        ]
-
-    new_features = []
-    for window in CENTRALITY_WINDOW_SIZES:
-        for column in feature_columns:
-            new_features.extend(rerturn_centrality_window_features(df[column], window))
-    return pd.concat([df, pd.concat(new_features, axis=1)], axis=1)
+            for window in CENTRALITY_WINDOW_SIZES
+        ],
+    )
 
 
 def add_signal_cutoff(
     df: pd.DataFrame, feature_columns: list[str], fs: int = 100
 ) -> pd.DataFrame:
-    for cutoff in CUTOFF_FREQUENCIES:
-        for column in feature_columns:
-            # TODO check if freq ?
-            df[f"{column}_filtered_{cutoff}Hz"] = butterworth_filter(
-                df[column], cutoff, fs
+    features = df[feature_columns].to_numpy(dtype=float)
+    return _concat_features(
+        df,
+        [
+            (
+                signal_cutoff_columns(feature_columns, cutoff),
+                partial(signal_cutoff_features, features, cutoff=cutoff, fs=fs),
             )
-    return df
+            for cutoff in CUTOFF_FREQUENCIES
+        ],
+    )
 
 
 def dominant_frequencies(df: pd.DataFrame, window_size: int, fs: int = 100):
-    freqs = np.fft.fftfreq(window_size, d=1 / fs)
-    half_freqs = freqs[: window_size // 2]
-
-    def freq_with_max_amplitude(window):
-        if len(window) < window_size:
-            return np.nan
-        fft_vals = np.fft.fft(window)
-        half_fft_vals = np.abs(fft_vals[: window_size // 2])
-        dominant_freq = half_freqs[np.argmax(half_fft_vals)]
-        return dominant_freq
-
-    return df.rolling(window=window_size).apply(freq_with_max_amplitude, raw=True)
+    values = df.to_numpy(dtype=float)
+    res = rolling_dominant_frequency(values.reshape(len(df), -1), window_size, fs)
+    if isinstance(df, pd.Series):
+        return pd.Series(res[:, 0], index=df.index, name=df.name)
+    return pd.DataFrame(res, index=df.index, columns=df.columns)
 
 
 def add_dominant_frequencies(
     df: pd.DataFrame, feature_columns: list[str], fs: int = 100
 ) -> pd.DataFrame:
-    for window in CENTRALITY_WINDOW_SIZES:
-        for column in feature_columns:
-            df[f"{column}_dominant_freq_{window}"] = dominant_frequencies(
-                df[column], window, fs
+    features = df[feature_columns].to_numpy(dtype=float)
+    return _concat_features(
+        df,
+        [
+            (
+                dominant_frequency_columns(feature_columns, window),
+                partial(dominant_frequency_features, features, window=window, fs=fs),
             )
-    return df
+            for window in CENTRALITY_WINDOW_SIZES
+        ],
+    )
@@ -0,0 +1,52 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+
+from utils.frames import read_last_row
+
+__all__ = (
+    "load_pca_model",
+    "processed_rows",
+    "save_pca_model",
+)
+
+
+def pca_model_path(output: Path) -> Path:
+    return output.with_name(f"{output.stem}_pca.pkl")
+
+
+def save_pca_model(output: Path, model: Pipeline) -> None:
+    """Keep the scaler and PCA next to `output`, for later appends to it"""
+    with open(pca_model_path(output), "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_pca_model(output: Path) -> Pipeline | None:
+    try:
+        with open(pca_model_path(output), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def processed_rows(output: Path, times: pd.Series, columns: list[str]) -> int:
+    """
+    Number of input rows, at `times`, that the feature engineering output at
+    `output` already covers, 0 if there's none yet. It must have `columns`,
+    i.e. it must have been made with the same settings
+    """
+    if not output.exists():
+        return 0
+
+    last_row = read_last_row(output)
+    if list(last_row.columns) != columns:
+        raise ValueError(
+            f"{output} doesn't have the features of this run, run without --append to write it again"
+        )
+    if last_row.empty:
+        return 0
+    last_time = pd.to_datetime(last_row[times.name].iloc[-1])
+    return int(np.searchsorted(pd.to_datetime(times), last_time, side="right"))
@@ -0,0 +1,166 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+from scipy.signal import sosfilt, sosfilt_zi
+from sklearn.pipeline import Pipeline
+
+from fe.config import (
+    CENTRALITY_WINDOW_FUNS,
+    CENTRALITY_WINDOW_SIZES,
+    CUTOFF_FREQUENCIES,
+    PCA_COMPONENTS,
+)
+from fe.helpers import (
+    butterworth_sos,
+    centrality_window_columns,
+    dominant_frequency_columns,
+    pca_columns,
+    signal_cutoff_columns,
+)
+from fe.rolling import rolling_dominant_frequency, rolling_statistics
+
+__all__ = (
+    "CausalLowPass",
+    "OnlineFeatures",
+    "RollingDominantFrequency",
+    "RollingStatistics",
+)
+
+
+def check_finite(rows: np.ndarray) -> None:
+    missing = np.flatnonzero(~np.isfinite(rows).all(axis=1))
+    if len(missing):
+        raise ValueError(f"Rows {missing.tolist()} have missing features")
+
+
+class _RollingTransformer(ABC):
+    """
+    Rolling feature over a stream of rows, keeping the last `window - 1`
+    rows seen. Every update computes the new rows with the batch function
+    over just those and the new ones, so that once there are `window` rows
+    the output is exactly the batch one, at O(window) per row
+    """
+
+    def __init__(self, n_columns: int, window: int) -> None:
+        self.window = window
+        self.history = np.empty((0, n_columns))
+
+    def update(self, rows: np.ndarray) -> np.ndarray:
+        """Features of the 2-D `rows`, NaN until `window` rows have been seen"""
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        data = np.concatenate([self.history, rows])
+        self.history = data[max(len(data) - self.window + 1, 0) :]
+        return self._compute(data)[len(data) - len(rows) :]
+
+    @abstractmethod
+    def _compute(self, data: np.ndarray) -> np.ndarray:
+        pass
+
+
+class RollingStatistics(_RollingTransformer):
+    """Online `fe.rolling.rolling_statistics`, i.e. the centrality windows"""
+
+    def __init__(
+        self, n_columns: int, window: int, funs=CENTRALITY_WINDOW_FUNS
+    ) -> None:
+        super().__init__(n_columns, window)
+        self.funs = funs
+
+    def _compute(self, data: np.ndarray) -> np.ndarray:
+        return rolling_statistics(data, self.window, self.funs)
+
+
+class RollingDominantFrequency(_RollingTransformer):
+    """Online `fe.rolling.rolling_dominant_frequency`"""
+
+    def __init__(self, n_columns: int, window: int, fs: float = 100) -> None:
+        super().__init__(n_columns, window)
+        self.fs = fs
+
+    def _compute(self, data: np.ndarray) -> np.ndarray:
+        return rolling_dominant_frequency(data, self.window, self.fs)
+
+
+class CausalLowPass:
+    """
+    Online low pass Butterworth filter, same design as `butterworth_filter`
+    but applied forward only, keeping the state of the filter between rows
+    (O(order) per row). The filter starts at steady state on the first row.
+
+    It can't match the batch `butterworth_filter`: that one runs the filter
+    forward and backward (`sosfiltfilt`), which needs the rows to come. The
+    causal output lags the signal by the phase delay of the filter and
+    attenuates with the response of a single pass (-3dB at the cutoff, where
+    the batch one is at -6dB), it matches `sosfilt` over the whole stream.
+
+    Rows with a NaN (or inf) are rejected with a `ValueError`, leaving the
+    state as it was: the filter would carry the NaN in its state and never
+    get rid of it (the batch filter makes the whole column NaN)
+    """
+
+    def __init__(self, n_columns: int, cutoff: float, fs: float = 100, order=4):
+        self.sos = butterworth_sos(cutoff, fs, order)
+        self.n_columns = n_columns
+        self.zi = None
+
+    def update(self, rows: np.ndarray) -> np.ndarray:
+        rows = np.atleast_2d(np.asarray(rows, dtype=float))
+        check_finite(rows)
+        if self.zi is None:
+            # (n_sections, 2, n_columns), steady state for the first row
+            self.zi = sosfilt_zi(self.sos)[:, :, None] * rows[0]
+        res, self.zi = sosfilt(self.sos, rows, axis=0, zi=self.zi)
+        return res
+
+
+class OnlineFeatures:
+    """
+    Centrality windows, dominant frequencies and (causal) signal cutoffs of
+    `feature_columns` for rows of aggregated data as they come, with the same
+    columns as the batch pipeline. With the `pca_model` of a feature
+    engineering run (see `fe.incremental.load_pca_model`), its principal
+    components as well, which only depend on the row itself.
+
+    Rows with a missing feature (NaN, f.e. an empty bin that wasn't
+    interpolated) are rejected before any transformer is updated, see
+    `CausalLowPass`
+    """
+
+    def __init__(
+        self,
+        feature_columns: list[str],
+        fs: float = 100,
+        pca_model: Pipeline | None = None,
+    ) -> None:
+        self.feature_columns = feature_columns
+        self.pca_model = pca_model
+        n_columns = len(feature_columns)
+
+        self.transformers = []
+        self.columns = []
+        if pca_model is not None:
+            self.columns += pca_columns(PCA_COMPONENTS)
+        for window in CENTRALITY_WINDOW_SIZES:
+            self.transformers.append(RollingStatistics(n_columns, window))
+            self.columns += centrality_window_columns(feature_columns, window)
+        for window in CENTRALITY_WINDOW_SIZES:
+            self.transformers.append(RollingDominantFrequency(n_columns, window, fs))
+            self.columns += dominant_frequency_columns(feature_columns, window)
+        for cutoff in CUTOFF_FREQUENCIES:
+            self.transformers.append(CausalLowPass(n_columns, cutoff, fs))
+            self.columns += signal_cutoff_columns(feature_columns, cutoff)
+
+    def update(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Feature rows of a frame with (at least) the feature columns"""
+        features = rows[self.feature_columns].to_numpy(dtype=float)
+        # All of them or none, so the transformers stay on the same rows
+        check_finite(features)
+        parts = [transformer.update(features) for transformer in self.transformers]
+        if self.pca_model is not None:
+            components = self.pca_model.transform(features)
+            parts.insert(
+                0, np.hstack([components[:, :size] for size in PCA_COMPONENTS])
+            )
+        block = np.concatenate(parts, axis=1)
+        return pd.DataFrame(block, index=rows.index, columns=self.columns, copy=False)
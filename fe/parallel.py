@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Hashable
+
+import numpy as np
+
+from fe.builder import FeatureMatrix
+from fe.helpers import COLUMNWISE_FAMILIES, FEATURE_FAMILIES
+
+__all__ = (
+    "compute_features",
+    "get_tasks",
+)
+
+
+@dataclass(frozen=True)
+class FeatureTask:
+    part: tuple[str, Any]
+    # Columns of the features block it reads, and of its part it writes
+    columns: slice | list[int]
+    out: slice
+
+
+def get_tasks(
+    matrix: FeatureMatrix,
+    n_features: int,
+    inputs: dict[Hashable, list[int]],
+    split: bool,
+) -> list[FeatureTask]:
+    """
+    Tasks filling the feature families of `matrix`, i.e. its `(family, param)`
+    parts, reading the feature columns of `inputs` (all of them by default).
+    With `split`, one per feature column for columnwise families
+    """
+    tasks = []
+    for part, columns in matrix.schema.items():
+        if not isinstance(part, tuple):
+            continue
+        family, _ = part
+        indices = inputs.get(part, slice(None))
+        if not split or family not in COLUMNWISE_FAMILIES:
+            tasks.append(FeatureTask(part, indices, slice(0, len(columns))))
+            continue
+        if isinstance(indices, slice):
+            indices = range(n_features)
+        width = len(columns) // len(indices)
+        tasks.extend(
+            FeatureTask(part, slice(col, col + 1), slice(i * width, (i + 1) * width))
+            for i, col in enumerate(indices)
+        )
+    return tasks
+
+
+def run_task(
+    task: FeatureTask,
+    features: np.ndarray,
+    out: np.ndarray,
+    options: dict[str, dict[str, Any]],
+) -> None:
+    family, param = task.part
+    FEATURE_FAMILIES[family](
+        features[:, task.columns], out, param, **options.get(family, {})
+    )
+
+
+# Input block of the worker processes, shared with the main one
+_shared: SharedMemory | None = None
+_features: np.ndarray | None = None
+
+
+def _attach(name: str, shape: tuple[int, int]) -> None:
+    global _shared, _features
+    _shared = SharedMemory(name=name)
+    _features = np.ndarray(shape, dtype=np.float64, buffer=_shared.buf)
+
+
+def _run_shared_task(
+    task: FeatureTask, shape: tuple[int, int], options: dict[str, dict[str, Any]]
+) -> np.ndarray:
+    out = np.empty(shape)
+    run_task(task, _features, out, options)
+    return out
+
+
+def compute_features(
+    features: np.ndarray,
+    matrix: FeatureMatrix,
+    inputs: dict[Hashable, list[int]] | None = None,
+    options: dict[str, dict[str, Any]] | None = None,
+    workers: int = 1,
+) -> None:
+    """
+    Fill every feature family of `matrix` from the 2-D `features` block (or
+    just its last rows, if `matrix` has fewer, with the rest as history) with
+    the keyword arguments of `options[family]` given to the family function.
+    Columnwise families read just the feature columns of `inputs[part]`, when
+    given.
+
+    With several `workers` the families are split column by column over a
+    process pool, all of them reading `features` from shared memory. Every
+    task writes its own columns, so the result is the same as the serial one
+    """
+    inputs = inputs or {}
+    options = options or {}
+    features = np.ascontiguousarray(features, dtype=np.float64)
+    if workers <= 1:
+        for task in get_tasks(matrix, features.shape[1], inputs, split=False):
+            run_task(task, features, matrix[task.part], options)
+        return
+
+    tasks = get_tasks(matrix, features.shape[1], inputs, split=True)
+    shared = SharedMemory(create=True, size=max(features.nbytes, 1))
+    try:
+        np.ndarray(features.shape, dtype=np.float64, buffer=shared.buf)[:] = features
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_attach,
+            initargs=(shared.name, features.shape),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _run_shared_task,
+                    task,
+                    (len(matrix.block), task.out.stop - task.out.start),
+                    options,
+                )
+                for task in tasks
+            ]
+            # Written in task order, whatever finishes first
+            for task, future in zip(tasks, futures):
+                matrix[task.part][:, task.out] = future.result()
+    finally:
+        shared.close()
+        shared.unlink()
@@ -0,0 +1,100 @@
+from typing import Callable, Generator
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = (
+    "rolling_dominant_frequency",
+    "rolling_statistics",
+    "sliding_windows",
+)
+
+# Windows reduced at once, bounds the memory taken by the copies some
+# reductions (f.e. median) make of the windows they get
+BLOCK_SIZE = 2**14
+
+
+def sliding_windows(
+    block: np.ndarray, window: int, block_size: int = BLOCK_SIZE
+) -> Generator[tuple[int, np.ndarray], None, None]:
+    """
+    Views of shape (n_windows, n_columns, window) over the complete windows
+    of the 2-D `block`, in batches of at most `block_size` windows. Every
+    batch comes with the row of `block` its first window ends at
+    """
+    if len(block) < window:
+        return
+    # Every window contiguous in memory, so that reductions along it add up
+    # in the same order whatever the columns next to it
+    columns = np.ascontiguousarray(block.T)
+    view = sliding_window_view(columns, window, axis=1).transpose(1, 0, 2)
+    for start in range(0, len(view), block_size):
+        yield start + window - 1, view[start : start + block_size]
+
+
+def _tail(block: np.ndarray, n_rows: int, window: int) -> tuple[np.ndarray, int]:
+    """
+    Rows of `block` needed by the windows of its last `n_rows`, along with
+    how many of them come before those
+    """
+    start = max(len(block) - n_rows - window + 1, 0)
+    return block[start:], len(block) - n_rows - start
+
+
+def rolling_statistics(
+    block: np.ndarray,
+    window: int,
+    funs: tuple[Callable, ...],
+    out: np.ndarray | None = None,
+    block_size: int = BLOCK_SIZE,
+) -> np.ndarray:
+    """
+    Every function of `funs` over a rolling window of every column of the
+    2-D `block`, with shape (n_rows, n_columns * len(funs)): for each column
+    the result of every function, one after the other. Written into `out`
+    when given, which can also hold just the last rows.
+
+    The functions must reduce along an `axis` keyword, like numpy's. The
+    same as `rolling(window).apply(fun)`: rows without a complete window
+    before them, or with a NaN in it, are NaN
+    """
+    block = np.asarray(block, dtype=float)
+    if out is None:
+        out = np.empty((len(block), block.shape[1] * len(funs)))
+    block, offset = _tail(block, len(out), window)
+    out[: max(window - 1 - offset, 0)] = np.nan
+    for row, windows in sliding_windows(block, window, block_size):
+        rows = slice(row - offset, row - offset + len(windows))
+        for i, fun in enumerate(funs):
+            out[rows, i :: len(funs)] = fun(windows, axis=-1)
+    return out
+
+
+def rolling_dominant_frequency(
+    block: np.ndarray,
+    window: int,
+    fs: float,
+    out: np.ndarray | None = None,
+    block_size: int = BLOCK_SIZE,
+) -> np.ndarray:
+    """
+    Frequency with the largest amplitude in the spectrum of a rolling window
+    of every column of the 2-D `block`, with shape (n_rows, n_columns).
+    Written into `out` when given, which can also hold just the last rows.
+
+    Only the non negative frequencies below Nyquist are looked at, so a real
+    FFT of each batch of windows is all it takes. Rows without a complete
+    window before them, or with a NaN in it, are NaN
+    """
+    block = np.asarray(block, dtype=float)
+    half_freqs = np.fft.rfftfreq(window, d=1 / fs)[: window // 2]
+    if out is None:
+        out = np.empty(block.shape)
+    block, offset = _tail(block, len(out), window)
+    out[: max(window - 1 - offset, 0)] = np.nan
+    for row, windows in sliding_windows(block, window, block_size):
+        amplitudes = np.abs(np.fft.rfft(windows, axis=-1)[..., : window // 2])
+        dominant = half_freqs[np.argmax(amplitudes, axis=-1)]
+        dominant[np.isnan(windows).any(axis=-1)] = np.nan
+        out[row - offset : row - offset + len(windows)] = dominant
+    return out
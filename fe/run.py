@@ -1,16 +1,28 @@
 import argparse
 from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
 
-from fe.helpers import (
-    add_centrality_window,
-    add_dominant_frequencies,
-    add_pca,
-    add_signal_cutoff,
+from fe.builder import FeatureMatrix
+from fe.helpers import fit_pca
+from fe.incremental import load_pca_model, processed_rows, save_pca_model
+from fe.parallel import compute_features
+from fe.schema import (
+    demand_schema,
+    get_schema,
+    read_feature_names,
+    schema_valid_rows,
 )
 from utils.columns import Columns
-from utils.parse import BaseArgs, get_base_parser
+from utils.frames import append_frame, read_frame, write_frame
+from utils.parse import (
+    FRAME_INPUT_HELP,
+    FRAME_OUTPUT_HELP,
+    BaseArgs,
+    get_base_parser,
+    parse_input_path,
+)
 
 INPUT_PATH = "output/experiment_1/data/preprocessing.csv"
 OUTPUT_PATH = "output/experiment_1/data/feature_engineering.csv"
@@ -18,45 +30,143 @@ OUTPUT_PATH = "output/experiment_1/data/feature_engineering.csv"
 
 @dataclass
 class Args(BaseArgs):
-    pass
+    pca_solver: str
+    float32: bool
+    workers: int
+    features: list[str] | None
+    append: bool
 
 
 def parse_args(args: list[str]) -> Args:
-    base_parser = get_base_parser(INPUT_PATH, OUTPUT_PATH)
+    base_parser = get_base_parser(
+        INPUT_PATH, OUTPUT_PATH, FRAME_INPUT_HELP, FRAME_OUTPUT_HELP
+    )
     parser = argparse.ArgumentParser(
         prog="fe",
         description="Feature engineering pipeline",
         parents=[base_parser],
     )
 
+    parser.add_argument(
+        "--pca-solver",
+        choices=("auto", "full", "randomized", "incremental"),
+        help="Solver used for the PCA, randomized or incremental ones are cheaper on very long recordings (default %(default)s).",
+        default="auto",
+    )
+    parser.add_argument(
+        "--float32",
+        action="store_true",
+        help="Keep the features in single precision, halving the memory taken by them and the size of OUTPUT_PATH.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Number of processes computing the features, each feature family is split column by column among them (default %(default)s).",
+        default=1,
+    )
+    parser.add_argument(
+        "--features",
+        type=parse_input_path,
+        help="File with the names of the features wanted, one per line (f.e. the ones kept by the feature selection of a model). Just those and what they need are computed.",
+        default=None,
+        metavar="FEATURES_PATH",
+    )
+    parser.add_argument(
+        "-a",
+        "--append",
+        action="store_true",
+        help="Just add the rows of INPUT_PATH that are newer than the last one of OUTPUT_PATH to it. Rolling windows read back the rows they need, filters are run over the whole input and the PCA fitted by the first run is applied to the new rows as is. Rows already written are left as they are.",
+    )
+
     arguments = parser.parse_args(args)
-    return Args(arguments.input, arguments.output)
+    return Args(
+        arguments.input,
+        arguments.output,
+        arguments.pca_solver,
+        arguments.float32,
+        arguments.workers,
+        None if arguments.features is None else read_feature_names(arguments.features),
+        arguments.append,
+    )
 
 
 def run(args: Args) -> pd.DataFrame:
     print(f"Running feature engineering on {args.input}")
 
-    df = pd.read_csv(args.input)
+    df = read_frame(args.input)
     # Make sure target doesn't get into feature selection
+    time_key = Columns.get_datetime_column()
     target_key = Columns.get_target_column()
-    target = df[target_key]
-    df = df.drop(columns=target_key)
-
-    # PCA
-    n_comps = (3, 5, 12)
-    for n_comp in n_comps:
-        df = add_pca(
-            df=df, feature_columns=Columns.get_feature_columns(), n_components=n_comp
-        )
-
-    # Rest
-    for fe_fun in (add_centrality_window, add_dominant_frequencies, add_signal_cutoff):
-        df = fe_fun(df=df, feature_columns=Columns.get_feature_columns())
+    input_columns = [col for col in df.columns if col not in (time_key, target_key)]
+    feature_columns = Columns.get_feature_columns()
+    features = df[feature_columns].to_numpy(dtype=float)
+
+    schema, inputs = get_schema(input_columns, feature_columns), {}
+    keep = None
+    if args.features is not None:
+        # Only what the requested features need, on the rows of a whole run
+        keep = schema_valid_rows(df, schema, feature_columns)
+        schema, inputs = demand_schema(schema, feature_columns, args.features)
+    columns = [col for cols in schema.values() for col in cols]
+    if args.features is not None:
+        columns = [col for col in columns if col in args.features or col == target_key]
+
+    # Rows already in the output are skipped, the ones before the new rows
+    # are still read as the history of their features
+    first = 0
+    if args.append:
+        first = processed_rows(args.output, df[time_key], [time_key, *columns])
+        if first == len(df):
+            print(f"Nothing new to add to {args.output}")
+            return pd.DataFrame(columns=[time_key, *columns])
+        print(f"Computing features for the last {len(df) - first} rows")
+
+    # PCA fitted on the data of the first run, then frozen for the appended rows
+    pca_part = next(
+        (part for part in schema if isinstance(part, tuple) and part[0] == "pca"), None
+    )
+    pca_model = None
+    if pca_part is not None and first > 0:
+        pca_model = load_pca_model(args.output)
+        if pca_model is None:
+            raise ValueError(
+                f"No PCA stored for {args.output}, run without --append to write it again"
+            )
+    elif pca_part is not None:
+        pca_model = fit_pca(features, max(pca_part[1]), args.pca_solver)
+
+    # Whole output allocated at once, every family fills its own columns
+    matrix = FeatureMatrix(
+        len(df) - first, schema, dtype=np.float32 if args.float32 else np.float64
+    )
+    if "input" in schema:
+        matrix["input"][:] = df[schema["input"]].iloc[first:]
+
+    # PCA (decomposed once for all sizes) and the rest
+    compute_features(
+        features,
+        matrix,
+        inputs=inputs,
+        options={"pca": {"model": pca_model}},
+        workers=args.workers,
+    )
 
     # Get target back in and drop rows with empty data (resulting from f.e.)
-    df = pd.concat([df, target], axis="columns").dropna(axis=0, how="any")
-
-    df.to_csv(args.output, index=False)
+    matrix["target"][:, 0] = df[target_key].iloc[first:]
+    rows = matrix.valid_rows(None if keep is None else keep[first:])
+    time = df[time_key].to_numpy()[first:][rows]
+    df = matrix.to_frame(rows, index=df.index[first:])
+    if args.features is not None:
+        df = df[columns]
+    df.insert(0, time_key, time)
+
+    if first > 0:
+        append_frame(df, args.output, float32=args.float32)
+    else:
+        write_frame(df, args.output, float32=args.float32)
+        if pca_model is not None:
+            save_pca_model(args.output, pca_model)
     print(f"Results saved to {args.output}")
     return df
 
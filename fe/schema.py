@@ -0,0 +1,139 @@
+from typing import Hashable
+
+import numpy as np
+import pandas as pd
+
+from fe.config import CENTRALITY_WINDOW_SIZES, CUTOFF_FREQUENCIES, PCA_COMPONENTS
+from fe.helpers import (
+    COLUMNWISE_FAMILIES,
+    centrality_window_columns,
+    dominant_frequency_columns,
+    pca_columns,
+    signal_cutoff_columns,
+)
+from utils.columns import Columns
+
+__all__ = (
+    "demand_schema",
+    "get_schema",
+    "read_feature_names",
+    "schema_valid_rows",
+)
+
+
+def get_schema(
+    input_columns: list[str], feature_columns: list[str]
+) -> dict[Hashable, list[str]]:
+    """Columns of the output, in order, for every part of the pipeline"""
+    schema = {
+        "input": input_columns,
+        ("pca", PCA_COMPONENTS): pca_columns(PCA_COMPONENTS),
+    }
+    for window in CENTRALITY_WINDOW_SIZES:
+        schema["centrality_window", window] = centrality_window_columns(
+            feature_columns, window
+        )
+    for window in CENTRALITY_WINDOW_SIZES:
+        schema["dominant_frequency", window] = dominant_frequency_columns(
+            feature_columns, window
+        )
+    for cutoff in CUTOFF_FREQUENCIES:
+        schema["signal_cutoff", cutoff] = signal_cutoff_columns(feature_columns, cutoff)
+    schema["target"] = [Columns.get_target_column()]
+    return schema
+
+
+def demand_schema(
+    schema: dict[Hashable, list[str]],
+    feature_columns: list[str],
+    requested: list[str],
+) -> tuple[dict[Hashable, list[str]], dict[Hashable, list[int]]]:
+    """
+    Smallest part of `schema` with the `requested` columns (and the target),
+    along with the feature columns every columnwise family has to read.
+
+    Families are cut down to the feature columns (all their statistics) and
+    the PCA to the sizes that have any requested column, so the schema holds
+    a few more columns than requested
+    """
+    unknown = set(requested).difference(
+        column for columns in schema.values() for column in columns
+    )
+    if unknown:
+        raise ValueError(f"Unknown features requested: {sorted(unknown)}")
+
+    requested = set(requested)
+    res, inputs = {}, {}
+    for part, columns in schema.items():
+        if part == "target":
+            res[part] = columns
+            continue
+        if requested.isdisjoint(columns):
+            continue
+        if not isinstance(part, tuple):
+            res[part] = [column for column in columns if column in requested]
+            continue
+
+        family, param = part
+        if family in COLUMNWISE_FAMILIES:
+            # Columns of every feature column come one after the other
+            width = len(columns) // len(feature_columns)
+            indices = sorted(
+                {columns.index(column) // width for column in requested & set(columns)}
+            )
+            res[part] = [
+                column
+                for i in indices
+                for column in columns[i * width : (i + 1) * width]
+            ]
+            inputs[part] = indices
+        else:
+            # PCA, one size after the other
+            sizes, offset = [], 0
+            for size in param:
+                if not requested.isdisjoint(columns[offset : offset + size]):
+                    sizes.append(size)
+                offset += size
+            res[family, tuple(sizes)] = pca_columns(sizes)
+    return res, inputs
+
+
+def schema_valid_rows(
+    df: pd.DataFrame, schema: dict[Hashable, list[str]], feature_columns: list[str]
+) -> np.ndarray:
+    """
+    Rows of `df` where every column of `schema` would be computed without NaN,
+    without computing them. This keeps a run with a `demand_schema` to the
+    rows of the one with the whole schema:
+
+    - input and target columns are NaN where they are in `df`
+    - the PCA where any feature column is
+    - rolling windows for their first `window - 1` rows, and where any feature
+      column is NaN in the window
+    - filters (run forward and backward) on every row, if any feature column
+      has a NaN
+    """
+    features_nan = df[feature_columns].isna().any(axis=1).to_numpy()
+    invalid = np.zeros(len(df), dtype=bool)
+    for part, columns in schema.items():
+        if not isinstance(part, tuple):
+            invalid |= df[columns].isna().any(axis=1).to_numpy()
+            continue
+        family, param = part
+        if family == "pca":
+            invalid |= features_nan
+        elif family == "signal_cutoff":
+            invalid |= features_nan.any()
+        else:
+            # NaN in any of the last `param` rows, the first ones lack rows
+            nan_count = np.concatenate([[0], np.cumsum(features_nan)])
+            start = np.maximum(np.arange(1, len(df) + 1) - param, 0)
+            invalid |= nan_count[1:] > nan_count[start]
+            invalid[: param - 1] = True
+    return ~invalid
+
+
+def read_feature_names(path: str) -> list[str]:
+    """Feature names from a file with one per line"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import json
+import os
 from dataclasses import dataclass
 from typing import Literal
 
+import joblib
 import numpy as np
 import pandas as pd
 from numpy.typing import ArrayLike
@@ -13,9 +15,35 @@ from sklearn.feature_selection import SelectKBest, f_regression
 from sklearn.linear_model import LinearRegression, SGDRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.tree import DecisionTreeRegressor
 
+CACHE_DIR = os.path.join(".cache", "models")
+CACHE_SIZE = 1024  # MB
+# Steps of the pipeline, grid parameters of the other ones go to the model
+PIPELINE_STEPS = ("scale", "select", "model")
+
+
+@dataclass
+class FittedPipeline:
+    """Fitted scaler, selector and model, along with the columns they take"""
+
+    pipeline: Pipeline
+    columns: list[str]
+
+    def predict(self, rows: pd.DataFrame) -> np.ndarray:
+        return self.pipeline.predict(rows[self.columns].to_numpy(dtype=np.float64))
+
+
+def load_pipeline(path: str, mmap: bool = True) -> FittedPipeline:
+    """
+    Pipeline saved by `RegressionModelRunner.save_pipeline`. Its arrays (f.e.
+    the training rows of KNN) are memory mapped unless `mmap` is False, so
+    loading doesn't read them and processes loading it share their pages
+    """
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
 
 @dataclass
 class RegressionModelResults:
@@ -36,11 +64,17 @@ class RegressionModelRunner:
         self,
         data: pd.DataFrame,
         model_or_grid_search: RegressorMixin | GridSearchCV,
+        k: int | Literal["all"] = 15,
+        cache_dir: str | None = CACHE_DIR,
     ) -> None:
         self.X = data.iloc[:, 1:-1]
         self.y = data.iloc[:, -1]
         self._model = model_or_grid_search
+        self.k = k
+        self.cache_dir = cache_dir
 
+        self.pipeline = None
+        self.scaler = None
         self.selector = None
         self.model = None
         self.X_train = None
@@ -64,52 +98,104 @@ class RegressionModelRunner:
         assert self.selector is not None, f"Selection hasn't been done!"
         return self.selector.scores_
 
+    @property
+    def selected_features(self) -> list[str]:
+        assert self.selector is not None, f"Selection hasn't been done!"
+        return list(self.X.columns[self.selector.get_support()])
+
     @property
     def predictions(self) -> np.ndarray:
         assert self.y_pred is not None, f"Model hasn't been run!"
         return self.y_pred
 
     def split(self, test_size: int = 0.8, shuffle: bool = True) -> None:
+        # As arrays, every fit of the grid search would convert the frames again
         self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            self.X, self.y, test_size=test_size, random_state=42, shuffle=shuffle
+            self.X.to_numpy(dtype=np.float64),
+            self.y.to_numpy(dtype=np.float64),
+            test_size=test_size,
+            random_state=42,
+            shuffle=shuffle,
         )
 
-    def scale(self) -> None:
-        scaler = StandardScaler()
-        self.X_train = scaler.fit_transform(self.X_train)
-        self.X_test = scaler.transform(self.X_test)
-
-    def select(self, k: int | Literal["all"] = 15) -> None:
-        selector = SelectKBest(score_func=f_regression, k=k)
-        self.X_train = selector.fit_transform(self.X_train, self.y_train)
-        self.X_test = selector.transform(self.X_test)
-        self.selector = selector
+    def get_pipeline(
+        self, model: RegressorMixin, memory: joblib.Memory | None = None
+    ) -> Pipeline:
+        """
+        Scaling, selection of the `k` best features and `model`. With a
+        `memory`, the fitted scaler and selector are kept there, so grid
+        search fits them once per fold and not for every set of parameters
+        """
+        return Pipeline(
+            [
+                ("scale", StandardScaler()),
+                ("select", SelectKBest(score_func=f_regression, k=self.k)),
+                ("model", model),
+            ],
+            memory=memory,
+        )
 
     def run(self) -> RegressionModelRunner:
         if self.X_train is None:
             self.split()
-        self.scale()
-        if self.selector is None:
-            self.select()
         return self._run()
 
     def save_results(self, path: str) -> None:
         with open(path, "w") as f:
             f.write(str(self.results))
 
-    def _fit_model(self) -> RegressorMixin:
-        self._model.fit(self.X_train, self.y_train)
+    def save_selected_features(self, path: str) -> None:
+        """One per line, can be given to `fe --features` to compute just these"""
+        with open(path, "w") as f:
+            f.write("\n".join(self.selected_features) + "\n")
+
+    def save_pipeline(self, path: str) -> None:
+        """Fitted pipeline, uncompressed so that `load_pipeline` can map its arrays"""
+        assert self.pipeline is not None, f"Model hasn't been run!"
+        joblib.dump(FittedPipeline(self.pipeline, list(self.X.columns)), path)
+
+    def _fit_pipeline(self) -> Pipeline:
         if isinstance(self._model, RegressorMixin):
-            return self._model
-        return self._model.best_estimator_
+            # A single fit, nothing would reuse the cache
+            return self.get_pipeline(self._model).fit(self.X_train, self.y_train)
+
+        memory = None
+        if self.cache_dir is not None:
+            memory = joblib.Memory(self.cache_dir, verbose=0)
+        search = self._model.set_params(
+            estimator=self.get_pipeline(self._model.estimator, memory),
+            param_grid=_pipeline_grid(self._model.param_grid),
+        )
+        search.fit(self.X_train, self.y_train)
+        if memory is not None:
+            # Least recently used fits first, like `LoaderCache`
+            memory.reduce_size(bytes_limit=f"{CACHE_SIZE}M")
+        # Saved and served without a reference to the cache
+        return search.best_estimator_.set_params(memory=None)
 
     def _run(self) -> RegressionModelRunner:
-        self.model = self._fit_model()
-        self.y_pred = self.model.predict(self.X_test)
+        self.pipeline = self._fit_pipeline()
+        self.scaler, self.selector, self.model = (
+            self.pipeline[step] for step in PIPELINE_STEPS
+        )
+        self.y_pred = self.pipeline.predict(self.X_test)
         self.results = RegressionModelResults(
-            params=self.model.get_params(),
+            params={**self.model.get_params(), "k": self.selector.k},
             mse=mean_squared_error(self.y_test, self.y_pred),
             r2=r2_score(self.y_test, self.y_pred),
         )
         print(self.results)
         return self
+
+
+def _pipeline_grid(param_grid: dict | list[dict]) -> dict | list[dict]:
+    """
+    Grid of the model for the pipeline, f.e. `n_neighbors` goes to
+    `model__n_neighbors` while `select__k` stays as it is
+    """
+    if isinstance(param_grid, list):
+        return [_pipeline_grid(grid) for grid in param_grid]
+    return {
+        name if name.split("__")[0] in PIPELINE_STEPS else f"model__{name}": values
+        for name, values in param_grid.items()
+    }
@@ -0,0 +1,161 @@
+from numbers import Integral
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import pairwise_distances
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.utils._param_validation import Interval
+
+__all__ = ("NeighborsRegressor",)
+
+
+class NeighborsRegressor(KNeighborsRegressor):
+    """
+    `KNeighborsRegressor` that can keep its training rows in single precision
+    (`float32`, which halves their memory) and search the neighbors
+    approximately. The trees would keep a double precision copy of the rows,
+    so `float32` searches by brute force, and can't go with `kd_tree` or
+    `ball_tree`.
+
+    With `n_probe`, the training rows are split in `n_lists` clusters (the
+    square root of their number by default), and every query only looks at
+    the rows of its `n_probe` nearest clusters. More probes find more of the
+    true neighbors for a slower query, `n_probe=n_lists` is exact
+    """
+
+    _parameter_constraints: dict = {
+        **KNeighborsRegressor._parameter_constraints,
+        "float32": ["boolean"],
+        "n_lists": [Interval(Integral, 1, None, closed="left"), None],
+        "n_probe": [Interval(Integral, 1, None, closed="left"), None],
+    }
+
+    def __init__(
+        self,
+        n_neighbors=5,
+        *,
+        weights="uniform",
+        algorithm="auto",
+        leaf_size=30,
+        p=2,
+        metric="minkowski",
+        metric_params=None,
+        n_jobs=None,
+        float32=False,
+        n_lists=None,
+        n_probe=None,
+    ):
+        super().__init__(
+            n_neighbors=n_neighbors,
+            weights=weights,
+            algorithm=algorithm,
+            leaf_size=leaf_size,
+            p=p,
+            metric=metric,
+            metric_params=metric_params,
+            n_jobs=n_jobs,
+        )
+        self.float32 = float32
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+
+    def fit(self, X, y) -> "NeighborsRegressor":
+        if self.float32 and self.algorithm in ("kd_tree", "ball_tree"):
+            raise ValueError(
+                f"float32 rows would be copied to float64 by algorithm={self.algorithm!r}, use 'brute' or 'auto'"
+            )
+        if self.float32:
+            self._fit_brute(self._as_dtype(X), y)
+        else:
+            super().fit(X, y)
+        if self.n_probe is None:
+            return self
+
+        n_lists = min(
+            self.n_lists or int(np.sqrt(self.n_samples_fit_)), self.n_samples_fit_
+        )
+        kmeans = KMeans(n_clusters=n_lists, n_init=1, random_state=0).fit(self._fit_X)
+        self.centroids_ = kmeans.cluster_centers_.astype(self._fit_X.dtype)
+        # Training rows of every cluster
+        order = np.argsort(kmeans.labels_, kind="stable")
+        sizes = np.bincount(kmeans.labels_, minlength=n_lists)
+        self.lists_ = np.split(order, np.cumsum(sizes)[:-1])
+        return self
+
+    def kneighbors(self, X=None, n_neighbors=None, return_distance=True):
+        if X is not None:
+            X = self._as_dtype(X)
+        if self.n_probe is None or X is None:
+            return super().kneighbors(X, n_neighbors, return_distance)
+
+        dist, ind = self._probe_kneighbors(X, n_neighbors or self.n_neighbors)
+        return (dist, ind) if return_distance else ind
+
+    def _fit_brute(self, X, y) -> None:
+        """
+        Fitted as with `algorithm="brute"` (which "auto" wouldn't always pick),
+        through a brute force copy so that the parameters are left as given
+        """
+        self._validate_params()
+        params = {
+            name: getattr(self, name) for name in KNeighborsRegressor._get_param_names()
+        }
+        brute = KNeighborsRegressor(**{**params, "algorithm": "brute"}).fit(X, y)
+        # Its fitted attributes (`_fit_X`, `_fit_method`, `n_features_in_`...)
+        vars(self).update(
+            (name, value) for name, value in vars(brute).items() if name not in params
+        )
+
+    def _as_dtype(self, X):
+        return np.asarray(X, dtype=np.float32) if self.float32 else X
+
+    def _probe_kneighbors(
+        self, X: np.ndarray, n_neighbors: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        X = np.asarray(X, dtype=self._fit_X.dtype)
+        n_probe = min(self.n_probe, len(self.lists_))
+        centroid_dist = pairwise_distances(
+            X,
+            self.centroids_,
+            metric=self.effective_metric_,
+            **self.effective_metric_params_,
+        )
+        probes = np.argpartition(centroid_dist, n_probe - 1, axis=1)[:, :n_probe]
+        # Queries probing every cluster, and which of their probes it is
+        queries = np.repeat(np.arange(len(X)), n_probe)
+        slots = np.tile(np.arange(n_probe), len(X))
+        order = np.argsort(probes.ravel(), kind="stable")
+        splits = np.cumsum(np.bincount(probes.ravel(), minlength=len(self.lists_)))
+        probing = zip(
+            np.split(queries[order], splits[:-1]), np.split(slots[order], splits[:-1])
+        )
+
+        # Nearest rows of every probed cluster, then the nearest of all of them
+        dist = np.full((len(X), n_probe, n_neighbors), np.inf, dtype=X.dtype)
+        ind = np.full((len(X), n_probe, n_neighbors), -1, dtype=np.intp)
+        for (rows, slot), members in zip(probing, self.lists_):
+            if not len(rows) or not len(members):
+                continue
+            cluster_dist = pairwise_distances(
+                X[rows],
+                self._fit_X[members],
+                metric=self.effective_metric_,
+                n_jobs=self.n_jobs,
+                **self.effective_metric_params_,
+            )
+            k = min(n_neighbors, len(members))
+            nearest = np.argpartition(cluster_dist, k - 1, axis=1)[:, :k]
+            dist[rows, slot, :k] = np.take_along_axis(cluster_dist, nearest, axis=1)
+            ind[rows, slot, :k] = members[nearest]
+
+        dist = dist.reshape(len(X), -1)
+        ind = ind.reshape(len(X), -1)
+        nearest = np.argsort(dist, axis=1, kind="stable")[:, :n_neighbors]
+        dist = np.take_along_axis(dist, nearest, axis=1)
+        ind = np.take_along_axis(ind, nearest, axis=1)
+
+        # Too few rows in the probed clusters, searched exactly
+        short = ind[:, -1] < 0
+        if short.any():
+            dist[short], ind[short] = super().kneighbors(X[short], n_neighbors)
+        return dist, ind
@@ -1,15 +1,18 @@
 import argparse
 import json
 from dataclasses import dataclass
+from typing import Any
 
-import pandas as pd
 from sklearn.model_selection import GridSearchCV
-from sklearn.neighbors import KNeighborsRegressor
 
 from models.base import RegressionModelRunner
+from models.knn.neighbors import NeighborsRegressor
+from models.knn.search import NeighborsGridSearchCV
+from utils.frames import read_frame
 from utils.parse import (
-    BaseArgs,
+    FRAME_INPUT_HELP,
     GridArgs,
+    ModelArgs,
     get_base_parser,
     get_grid_and_single_subparsers,
 )
@@ -19,18 +22,99 @@ OUTPUT_PATH = "output/experiment_1/models/knn.txt"
 
 
 @dataclass
-class KnnArgs(BaseArgs):
+class KnnArgs(ModelArgs):
     neighbors: int
     weights: str
     metric: str
+    # Keyword arguments of `NeighborsRegressor` for the neighbors search
+    engine: dict[str, Any]
+
+
+@dataclass
+class KnnGridArgs(GridArgs):
+    reuse_neighbors: bool
+    engine: dict[str, Any]
+
+
+def parse_engine(args: argparse.Namespace) -> dict[str, Any]:
+    return {
+        "algorithm": args.algorithm,
+        "leaf_size": args.leaf_size,
+        "n_jobs": args.query_jobs,
+        "float32": args.float32,
+        "n_lists": args.lists,
+        "n_probe": args.probes,
+    }
+
+
+def parse_grid(args: argparse.Namespace) -> KnnGridArgs:
+    return KnnGridArgs(
+        args.input,
+        args.output,
+        args.k,
+        args.cache,
+        args.file,
+        args.jobs,
+        args.reuse_neighbors,
+        parse_engine(args),
+    )
 
 
 def parse_single(args: argparse.Namespace) -> KnnArgs:
-    return KnnArgs(args.input, args.output, args.neighbors, args.weights, args.metric)
+    return KnnArgs(
+        args.input,
+        args.output,
+        args.k,
+        args.cache,
+        args.neighbors,
+        args.weights,
+        args.metric,
+        parse_engine(args),
+    )
 
 
-def parse_args(args: list[str]) -> GridArgs | KnnArgs:
-    base_parser = get_base_parser(INPUT_PATH, OUTPUT_PATH)
+def add_engine_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group(title="Neighbors search argument handling")
+    group.add_argument(
+        "--algorithm",
+        type=str,
+        default="auto",
+        choices=["auto", "brute", "kd_tree", "ball_tree"],
+        help="Structure searching the neighbors (default: %(default)s)",
+    )
+    group.add_argument(
+        "--leaf-size",
+        type=int,
+        default=30,
+        help="Leaf size of the kd and ball trees (default: %(default)s)",
+    )
+    group.add_argument(
+        "--query-jobs",
+        type=int,
+        default=None,
+        help="Number of processes querying the neighbors, -1 for all CPUs (default: %(default)s)",
+    )
+    group.add_argument(
+        "--float32",
+        action="store_true",
+        help="Keep the training rows in single precision, searched by brute force (the trees would copy them to double precision)",
+    )
+    group.add_argument(
+        "--probes",
+        type=int,
+        default=None,
+        help="Search the neighbors approximately, in just this many of the nearest clusters of training rows, more is slower and finds more of the true neighbors (default: exact search)",
+    )
+    group.add_argument(
+        "--lists",
+        type=int,
+        default=None,
+        help="Number of clusters of training rows for --probes (default: square root of the number of rows)",
+    )
+
+
+def parse_args(args: list[str]) -> KnnGridArgs | KnnArgs:
+    base_parser = get_base_parser(INPUT_PATH, OUTPUT_PATH, FRAME_INPUT_HELP)
     parser = argparse.ArgumentParser(
         prog="models.knn",
         description="Run K-Nearest Neighbors Regressor",
@@ -39,6 +123,15 @@ def parse_args(args: list[str]) -> GridArgs | KnnArgs:
         parser, base_parser
     )
 
+    grid_subparser.add_argument(
+        "-r",
+        "--reuse-neighbors",
+        action="store_true",
+        help="Query the neighbors once per fold and metric, at the largest number of neighbors, and score every number of neighbors and weights from them",
+    )
+    add_engine_arguments(grid_subparser)
+    grid_subparser.set_defaults(fun=parse_grid)
+
     single_subparser.add_argument(
         "-n",
         "--neighbors",
@@ -62,6 +155,7 @@ def parse_args(args: list[str]) -> GridArgs | KnnArgs:
         choices=["euclidean", "manhattan", "minkowski"],
         help="Types of metric to use (default: %(default)s)",
     )
+    add_engine_arguments(single_subparser)
     single_subparser.set_defaults(fun=parse_single)
 
     arguments = parser.parse_args(args)
@@ -69,27 +163,48 @@ def parse_args(args: list[str]) -> GridArgs | KnnArgs:
     if arguments.command is None:
         parser.print_help()
         exit()
+    if arguments.float32 and arguments.algorithm in ("kd_tree", "ball_tree"):
+        parser.error(f"--float32 can't be used with --algorithm {arguments.algorithm}")
 
     return arguments.fun(arguments)
 
 
-def run(args: KnnArgs | GridArgs) -> RegressionModelRunner:
+def run(args: KnnArgs | KnnGridArgs) -> RegressionModelRunner:
     if isinstance(args, GridArgs):
         param_grid = json.load(args.file)
 
-        model = GridSearchCV(
-            KNeighborsRegressor(), param_grid, cv=5, scoring="neg_mean_squared_error"
-        )
+        if args.reuse_neighbors:
+            # Scored by the negative MSE as well
+            model = NeighborsGridSearchCV(
+                NeighborsRegressor(**args.engine), param_grid, cv=5, n_jobs=args.jobs
+            )
+        else:
+            model = GridSearchCV(
+                NeighborsRegressor(**args.engine),
+                param_grid,
+                cv=5,
+                scoring="neg_mean_squared_error",
+                n_jobs=args.jobs,
+            )
     else:
-        model = KNeighborsRegressor(
-            n_neighbors=args.neighbors, weights=args.weights, metric=args.metric
+        model = NeighborsRegressor(
+            n_neighbors=args.neighbors,
+            weights=args.weights,
+            metric=args.metric,
+            **args.engine,
         )
 
-    df = pd.read_csv(args.input)
-    model_runner = RegressionModelRunner(df, model)
+    df = read_frame(args.input)
+    model_runner = RegressionModelRunner(df, model, args.k, args.cache)
 
     model_runner.run()
     model_runner.save_results(args.output)
+    model_runner.save_selected_features(
+        args.output.with_name(f"{args.output.stem}_features.txt")
+    )
+    model_runner.save_pipeline(
+        args.output.with_name(f"{args.output.stem}_pipeline.joblib")
+    )
     return model_runner
 
 
@@ -0,0 +1,152 @@
+import numpy as np
+from scipy.stats import rankdata
+from sklearn.base import BaseEstimator, clone
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import ParameterGrid, check_cv
+from sklearn.pipeline import Pipeline
+from sklearn.utils.parallel import Parallel, delayed
+
+__all__ = ("NeighborsGridSearchCV",)
+
+# Parameters scored from the neighbors of the largest k, the others need a query
+SHARED_PARAMS = ("n_neighbors", "weights")
+
+
+def neighbor_weights(dist: np.ndarray) -> np.ndarray:
+    """`weights="distance"` of the neighbors, as `KNeighborsRegressor` does it"""
+    with np.errstate(divide="ignore"):
+        weights = 1.0 / dist
+    # Training points at zero distance get all of the weight
+    inf_mask = np.isinf(weights)
+    inf_row = np.any(inf_mask, axis=1)
+    weights[inf_row] = inf_mask[inf_row]
+    return weights
+
+
+def neighbors_predict(
+    dist: np.ndarray, ind: np.ndarray, y: np.ndarray, weights: str
+) -> np.ndarray:
+    """Prediction of `KNeighborsRegressor` from its neighbors and training targets"""
+    if weights == "uniform":
+        return np.mean(y[ind], axis=1)
+    if weights != "distance":
+        raise ValueError(f"Can't score weights={weights!r} from the neighbors")
+    weights = neighbor_weights(dist)
+    return np.sum(y[ind] * weights, axis=1) / np.sum(weights, axis=1)
+
+
+def query_neighbors(
+    estimator: BaseEstimator,
+    params: dict,
+    X: np.ndarray,
+    y: np.ndarray,
+    train: np.ndarray,
+    test: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Distances and indices (into `train`) of the neighbors of every `test`
+    row, fitting `estimator` with `params` (a pipeline ending with the
+    neighbors model, or just that) on the `train` rows
+    """
+    estimator = clone(estimator).set_params(**params).fit(X[train], y[train])
+    if isinstance(estimator, Pipeline):
+        X_test = estimator[:-1].transform(X[test])
+        return estimator[-1].kneighbors(X_test)
+    return estimator.kneighbors(X[test])
+
+
+class NeighborsGridSearchCV(BaseEstimator):
+    """
+    Grid search of a `KNeighborsRegressor`, or a pipeline ending with one,
+    scored by the negative MSE over `cv` folds like `GridSearchCV`.
+
+    Candidates that only differ in `n_neighbors` and `weights` share the
+    neighbors: every fold runs one query at their largest k, and every
+    smaller k and both weights are scored from its first columns. The scores
+    are the ones of `GridSearchCV` (up to neighbors tied in distance at the
+    k-th place), with a query per fold and set of the other parameters
+    (f.e. the metric) instead of one per candidate
+    """
+
+    def __init__(
+        self,
+        estimator: BaseEstimator,
+        param_grid: dict | list[dict],
+        cv=5,
+        n_jobs: int | None = None,
+    ) -> None:
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_jobs = n_jobs
+
+    def fit(self, X: np.ndarray, y: np.ndarray) -> "NeighborsGridSearchCV":
+        X, y = np.asarray(X), np.asarray(y)
+        prefix = (
+            f"{self.estimator.steps[-1][0]}__"
+            if isinstance(self.estimator, Pipeline)
+            else ""
+        )
+        k_name, weights_name = (f"{prefix}{name}" for name in SHARED_PARAMS)
+        defaults = self.estimator.get_params()
+
+        candidates = list(ParameterGrid(self.param_grid))
+        # Candidates by the parameters of their query, with its largest k
+        queries: dict[tuple, list[int]] = {}
+        for i, params in enumerate(candidates):
+            key = tuple(
+                sorted(
+                    (name, value)
+                    for name, value in params.items()
+                    if name not in (k_name, weights_name)
+                )
+            )
+            queries.setdefault(key, []).append(i)
+        max_k = {
+            key: max(candidates[i].get(k_name, defaults[k_name]) for i in indices)
+            for key, indices in queries.items()
+        }
+
+        splits = list(check_cv(self.cv, y, classifier=False).split(X, y))
+        neighbors = Parallel(n_jobs=self.n_jobs)(
+            delayed(query_neighbors)(
+                self.estimator, {**dict(key), k_name: max_k[key]}, X, y, train, test
+            )
+            for key in queries
+            for train, test in splits
+        )
+
+        scores = np.empty((len(candidates), len(splits)))
+        for n, key in enumerate(queries):
+            for fold, (train, test) in enumerate(splits):
+                dist, ind = neighbors[n * len(splits) + fold]
+                for i in queries[key]:
+                    k = candidates[i].get(k_name, defaults[k_name])
+                    weights = candidates[i].get(weights_name, defaults[weights_name])
+                    y_pred = neighbors_predict(
+                        dist[:, :k], ind[:, :k], y[train], weights
+                    )
+                    scores[i, fold] = -mean_squared_error(y[test], y_pred)
+
+        mean_scores = scores.mean(axis=1)
+        ranks = rankdata(-mean_scores, method="min").astype(np.int32)
+        self.cv_results_ = {
+            "params": candidates,
+            "mean_test_score": mean_scores,
+            "std_test_score": scores.std(axis=1),
+            "rank_test_score": ranks,
+            **{
+                f"split{fold}_test_score": scores[:, fold]
+                for fold in range(len(splits))
+            },
+        }
+        self.best_index_ = int(ranks.argmin())
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = mean_scores[self.best_index_]
+        self.best_estimator_ = (
+            clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        )
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.best_estimator_.predict(X)
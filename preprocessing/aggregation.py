@@ -0,0 +1,250 @@
+from dataclasses import dataclass
+from typing import Callable, Union
+
+import numpy as np
+import pandas as pd
+
+__all__ = (
+    "BinAssignment",
+    "StreamingAggregator",
+    "aggregate_bins",
+    "bin_edges",
+    "get_last",
+    "median",
+)
+
+
+def median(s: pd.Series) -> Union[pd.NA, float]:
+    if not s.empty:
+        return s.median()
+    return pd.NA
+
+
+def get_last(s: Union[pd.NA, pd.Series]):
+    if not s.empty:
+        return s.to_numpy()[-1]
+    return np.nan
+
+
+def bin_edges(
+    date_range: pd.DatetimeIndex, bin_width: pd.Timedelta | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Left and right edges of the bins of `date_range`
+
+    Without `bin_width` the range is taken as regular and consecutive labels
+    delimit the bins, so the last label closes the previous bin and starts
+    none. With it, every label starts a bin `bin_width` wide, which lets the
+    range skip whole stretches of time.
+    """
+    edges = np.asarray(date_range, dtype="datetime64[ns]")
+    if bin_width is None:
+        return edges[:-1], edges[1:]
+    return edges, edges + pd.Timedelta(bin_width).to_timedelta64()
+
+
+@dataclass
+class BinAssignment:
+    """
+    Membership of every raw sample in the bins of a date range
+
+    Bins include both of their edges (see `bin_edges`), so bin `i` of a
+    regular range covers `[date_range[i], date_range[i + 1]]` as
+    `s.loc[t:t_next]` does, and a sample lying exactly on an edge shared by
+    two bins belongs to both. `rows` and `codes` are sorted by bin and then
+    by time, so every non empty bin is a contiguous segment
+    `[starts[j], ends[j])`.
+    """
+
+    rows: np.ndarray
+    codes: np.ndarray
+
+    @classmethod
+    def from_index(
+        cls,
+        index: pd.DatetimeIndex,
+        date_range: pd.DatetimeIndex,
+        bin_width: pd.Timedelta | None = None,
+    ) -> "BinAssignment":
+        times = np.asarray(index, dtype="datetime64[ns]")
+        lefts, rights = bin_edges(date_range, bin_width=bin_width)
+
+        if np.all(times[1:] >= times[:-1]):
+            order = np.arange(len(times))
+        else:
+            # Stable sort keeps the original order of samples sharing a timestamp
+            order = np.argsort(times, kind="stable")
+            times = times[order]
+
+        # Bin whose left edge is the last one not after the sample
+        codes = np.searchsorted(lefts, times, side="right") - 1
+        valid = codes >= 0
+        valid[valid] = times[valid] <= rights[codes[valid]]
+
+        # Samples sitting on the left edge of a bin may also close the previous one
+        prev = codes - 1
+        shared = prev >= 0
+        shared[shared] = times[shared] <= rights[prev[shared]]
+
+        rows = np.concatenate([order[valid], order[shared]])
+        codes = np.concatenate([codes[valid], prev[shared]])
+        positions = np.concatenate([np.flatnonzero(valid), np.flatnonzero(shared)])
+        by_bin = np.lexsort((positions, codes))
+        return cls(rows=rows[by_bin], codes=codes[by_bin])
+
+    def __post_init__(self) -> None:
+        new_bin = np.ones(len(self.codes), dtype=bool)
+        new_bin[1:] = self.codes[1:] != self.codes[:-1]
+        # Non empty bins and the segment each one spans in `rows`
+        self.starts = np.flatnonzero(new_bin)
+        self.ends = np.append(self.starts[1:], len(self.codes))
+        self.bins = self.codes[self.starts]
+
+
+def _median_by_bin(values: pd.DataFrame, assignment: BinAssignment) -> np.ndarray:
+    return values.groupby(assignment.codes, sort=True).median().to_numpy()
+
+
+def _last_by_bin(values: pd.DataFrame, assignment: BinAssignment) -> np.ndarray:
+    return values.to_numpy()[assignment.ends - 1]
+
+
+# Reducers with a one pass implementation over all the columns they are mapped to
+VECTORIZED_REDUCERS: dict[Callable, Callable] = {
+    median: _median_by_bin,
+    get_last: _last_by_bin,
+}
+
+
+def _apply_by_bin(
+    fun: Callable, values: pd.DataFrame, assignment: BinAssignment
+) -> np.ndarray:
+    """Fallback for reducers without a vectorized counterpart"""
+    res = np.empty((len(assignment.bins), values.shape[1]), dtype=float)
+    for j, (start, end) in enumerate(zip(assignment.starts, assignment.ends)):
+        for k, col in enumerate(values.columns):
+            res[j, k] = fun(values[col].iloc[start:end])
+    return res
+
+
+def _reduce_bins(
+    df: pd.DataFrame,
+    column_function_map: dict[str, Callable],
+    assignment: BinAssignment,
+) -> np.ndarray:
+    """Values of every non empty bin of `assignment`, one column per mapped column"""
+    columns = list(column_function_map.keys())
+    res = np.empty((len(assignment.bins), len(columns)), dtype=float)
+
+    # Group columns by reducer so each one runs once
+    groups: dict[Callable, list[int]] = {}
+    for k, col in enumerate(columns):
+        groups.setdefault(column_function_map[col], []).append(k)
+
+    for fun, ks in groups.items():
+        values = df[[columns[k] for k in ks]].iloc[assignment.rows]
+        values = values.reset_index(drop=True).astype(float)
+        reducer = VECTORIZED_REDUCERS.get(fun)
+        if reducer is not None:
+            res[:, ks] = reducer(values, assignment)
+        else:
+            res[:, ks] = _apply_by_bin(fun, values, assignment)
+    return res
+
+
+def aggregate_bins(
+    df: pd.DataFrame,
+    column_function_map: dict[str, Callable],
+    date_range: pd.DatetimeIndex,
+    bin_width: pd.Timedelta | None = None,
+) -> pd.DataFrame:
+    """
+    Aggregate the raw samples of `df` (indexed by time) into the bins of
+    `date_range` (see `bin_edges`), computing every reducer of `column_function_map` for all
+    the columns mapped to it at once. Empty bins are left as NaN.
+    """
+    columns = list(column_function_map.keys())
+    res = np.full((len(date_range), len(columns)), np.nan)
+
+    assignment = BinAssignment.from_index(df.index, date_range, bin_width=bin_width)
+    if len(assignment.codes):
+        res[assignment.bins] = _reduce_bins(df, column_function_map, assignment)
+
+    return pd.DataFrame(res, index=date_range, columns=columns)
+
+
+class StreamingAggregator:
+    """
+    Fold time ordered chunks of raw samples into the bins of `date_range`
+
+    Only the per-bin results and the samples of the bins that are still
+    open are kept between chunks, so memory depends on the number of bins
+    and on the chunk size, not on the number of rows of the source.
+
+    A bin is closed as soon as a chunk reaches past its right edge: since
+    samples arrive in time order nothing later can fall into it. Its values
+    are then computed from all of its samples, which keeps every reducer,
+    median included, exact. Chunks going back in time are rejected.
+    """
+
+    def __init__(
+        self,
+        column_function_map: dict[str, Callable],
+        date_range: pd.DatetimeIndex,
+        bin_width: pd.Timedelta | None = None,
+    ) -> None:
+        self.column_function_map = column_function_map
+        self.date_range = date_range
+        self.bin_width = bin_width
+        self.lefts, self.rights = bin_edges(date_range, bin_width=bin_width)
+        self.res = np.full((len(date_range), len(column_function_map)), np.nan)
+        # First bin that hasn't been closed yet and samples that may still feed it
+        self.closed = 0
+        self.pending = None
+        self.last_time = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        if not len(self.rights):
+            return
+        times = np.asarray(df.index, dtype="datetime64[ns]")
+        # Samples out of the range never belong to any bin
+        inside = (times >= self.lefts[0]) & (times <= self.rights[-1])
+        df, times = df[inside], times[inside]
+        if not len(df):
+            return
+
+        if self.last_time is not None and times.min() < self.last_time:
+            raise ValueError(
+                "Streaming aggregation needs samples in time order, "
+                "load the file without chunks instead"
+            )
+        self.last_time = times.max()
+
+        if self.pending is not None:
+            df = pd.concat([self.pending, df])
+        # Bins ending before the newest sample can't get anything else
+        closing = np.searchsorted(self.rights, self.last_time, side="left")
+        self._fold(df, until=closing)
+
+        keep = np.asarray(df.index, dtype="datetime64[ns]") >= self.lefts[closing]
+        self.pending = df[keep]
+
+    def result(self) -> pd.DataFrame:
+        if self.pending is not None:
+            self._fold(self.pending, until=len(self.date_range))
+            self.pending = None
+        return pd.DataFrame(
+            self.res,
+            index=self.date_range,
+            columns=list(self.column_function_map.keys()),
+        )
+
+    def _fold(self, df: pd.DataFrame, until: int) -> None:
+        assignment = BinAssignment.from_index(
+            df.index, self.date_range, bin_width=self.bin_width
+        )
+        if len(assignment.codes):
+            values = _reduce_bins(df, self.column_function_map, assignment)
+            new = (assignment.bins >= self.closed) & (assignment.bins < until)
+            self.res[assignment.bins[new]] = values[new]
+        self.closed = max(self.closed, until)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Any, Callable
+
+import pandas as pd
+
+__all__ = (
+    "LoaderCache",
+    "file_fingerprint",
+)
+
+CACHE_DIR = os.path.join(".cache", "preprocessing")
+CACHE_SIZE = 2048  # MB
+
+
+def file_fingerprint(path: str) -> dict[str, Any]:
+    """Cheap stand in for the content of a file: its size and modification time"""
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def function_name(fun: Callable) -> str:
+    return f"{fun.__module__}.{fun.__qualname__}"
+
+
+def date_range_fingerprint(
+    date_range: pd.DatetimeIndex, bin_width: pd.Timedelta | None
+) -> str:
+    digest = hashlib.sha256(date_range.asi8.tobytes())
+    digest.update(str(date_range.dtype).encode())
+    digest.update(str(bin_width).encode())
+    return digest.hexdigest()
+
+
+class LoaderCache:
+    """
+    On disk cache for the frames produced by the loaders
+
+    Every entry is a pickled frame in its own file, named after the hash of
+    the key describing how the frame was made. Reading an entry refreshes
+    its modification time, and once the cache grows over `max_size` MB the
+    least recently used entries are evicted first.
+    """
+
+    EXTENSION = ".pkl"
+
+    def __init__(self, path: str = CACHE_DIR, max_size: int = CACHE_SIZE) -> None:
+        self.path = path
+        self.max_size = max_size
+
+    @staticmethod
+    def make_key(**kwargs) -> str:
+        dump = json.dumps(kwargs, sort_keys=True, default=str)
+        return hashlib.sha256(dump.encode()).hexdigest()
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        entry = self._entry(key)
+        try:
+            with open(entry, "rb") as f:
+                df = pickle.load(f)
+            os.utime(entry)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            # Missing, or evicted / half written by a concurrent run
+            return None
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        entry = self._entry(key)
+        # Write somewhere else first so readers never see half an entry
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith(self.EXTENSION):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, name in sorted(entries):
+            if size <= self.max_size * 2**20:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.path, key + self.EXTENSION)
@@ -1,10 +1,14 @@
-from typing import Generator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Generator, Iterable, Literal
 
+import numpy as np
 import pandas as pd
 
+from preprocessing.cache import LoaderCache
 from preprocessing.loaders import (
     AccelerometerLoader,
     BarometerLoader,
+    BaseLoader,
     GyroscopeLoader,
     HeartRateLoader,
     LinearAccelerometerLoader,
@@ -12,30 +16,126 @@ from preprocessing.loaders import (
     MagnetometerLoader,
     ProximityLoader,
 )
+from preprocessing.store import SensorStore
 from preprocessing.time_parser import TimeParser
 
+LOADER_CLASSES = (
+    AccelerometerLoader,
+    BarometerLoader,
+    GyroscopeLoader,
+    HeartRateLoader,
+    LinearAccelerometerLoader,
+    LocationLoader,
+    MagnetometerLoader,
+    ProximityLoader,
+)
 
-def load_all(
-    base_data_path: str, time_parser: TimeParser, date_range: pd.DatetimeIndex
+EXECUTORS: dict[str, type[Executor]] = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+def load_one(
+    loader_class: type[BaseLoader],
+    base_data_path: str,
+    time_parser: TimeParser,
+    bins: list[tuple[pd.DatetimeIndex, pd.Timedelta | None]],
+    chunksize: int | None = None,
+    cache: LoaderCache | None = None,
+    store: SensorStore | None = None,
+) -> list[pd.DataFrame]:
+    # Module level so it can be sent to worker processes
+    loader = loader_class(
+        base_data_path=base_data_path, chunksize=chunksize, cache=cache, store=store
+    )
+    return loader.load_resolutions(time_parser=time_parser, bins=bins)
+
+
+def join_all(
+    dfs: Iterable[pd.DataFrame],
+    columns: list[list[str]],
+    date_range: pd.DatetimeIndex,
 ) -> pd.DataFrame:
-    res = pd.DataFrame(index=date_range)
-
-    def _load_all(
-        base_data_path: str, time_parser: TimeParser, date_range: pd.DatetimeIndex
-    ) -> Generator:
-        for loader_class in (
-            AccelerometerLoader,
-            BarometerLoader,
-            GyroscopeLoader,
-            HeartRateLoader,
-            LinearAccelerometerLoader,
-            LocationLoader,
-            MagnetometerLoader,
-            ProximityLoader,
-        ):
-            loader = loader_class(base_data_path=base_data_path)
-            yield loader.load(time_parser=time_parser, date_range=date_range)
-
-    for df in _load_all(base_data_path, time_parser=time_parser, date_range=date_range):
-        res = res.merge(df, right_index=True, left_index=True)
+    """
+    Join the outputs of the loaders on `date_range`, allocating the final
+    block once and writing each output straight into its own column slice
+    """
+    n_columns = sum(len(cols) for cols in columns)
+    block = np.full((len(date_range), n_columns), np.nan)
+
+    offset = 0
+    for df, cols in zip(dfs, columns):
+        if not df.index.equals(date_range):
+            df = df.reindex(date_range)
+        block[:, offset : offset + len(cols)] = df[cols].to_numpy(dtype=float)
+        offset += len(cols)
+
+    res = pd.DataFrame(
+        block,
+        index=date_range,
+        columns=[col for cols in columns for col in cols],
+        copy=False,
+    )
     return res.reset_index(names="Time")
+
+
+def load_all(
+    base_data_path: str,
+    time_parser: TimeParser,
+    date_range: pd.DatetimeIndex,
+    bin_width: pd.Timedelta | None = None,
+    **kwargs,
+) -> pd.DataFrame:
+    return load_all_resolutions(
+        base_data_path=base_data_path,
+        time_parser=time_parser,
+        bins=[(date_range, bin_width)],
+        **kwargs,
+    )[0]
+
+
+def load_all_resolutions(
+    base_data_path: str,
+    time_parser: TimeParser,
+    bins: list[tuple[pd.DatetimeIndex, pd.Timedelta | None]],
+    chunksize: int | None = None,
+    cache: LoaderCache | None = None,
+    store: SensorStore | None = None,
+    workers: int = 1,
+    executor: Literal["thread", "process"] = "process",
+) -> list[pd.DataFrame]:
+    """
+    Joined data of all sensors for every `(date_range, bin_width)` of `bins`,
+    every sensor is read just once for all of them
+    """
+
+    def _load_all() -> Generator:
+        args = (base_data_path, time_parser, bins, chunksize, cache, store)
+        if workers <= 1:
+            for loader_class in LOADER_CLASSES:
+                yield load_one(loader_class, *args)
+            return
+
+        # Every loader reads its own file, so they can all run at once.
+        # Results come back in LOADER_CLASSES order whatever finishes first
+        with EXECUTORS[executor](max_workers=workers) as pool:
+            futures = [
+                pool.submit(load_one, loader_class, *args)
+                for loader_class in LOADER_CLASSES
+            ]
+            for future in futures:
+                yield future.result()
+
+    columns = [
+        loader_class(base_data_path=base_data_path).output_columns
+        for loader_class in LOADER_CLASSES
+    ]
+    # One list per loader, with a frame per resolution
+    outputs = list(_load_all())
+    return [
+        join_all(
+            (output[i] for output in outputs), columns=columns, date_range=date_range
+        )
+        for i, (date_range, _) in enumerate(bins)
+    ]
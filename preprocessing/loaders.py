@@ -1,11 +1,24 @@
 import os
 import re
 from abc import ABC, abstractmethod
-from typing import Callable, Union
+from typing import Callable, Generator
 
-import numpy as np
 import pandas as pd
 
+from preprocessing.aggregation import (
+    StreamingAggregator,
+    aggregate_bins,
+    bin_edges,
+    get_last,
+    median,
+)
+from preprocessing.cache import (
+    LoaderCache,
+    date_range_fingerprint,
+    file_fingerprint,
+    function_name,
+)
+from preprocessing.store import SensorStore
 from preprocessing.time_parser import TimeParser
 
 __all__ = (
@@ -20,21 +33,10 @@ __all__ = (
 )
 
 
-def median(s: pd.Series) -> Union[pd.NA, float]:
-    if not s.empty:
-        return s.median()
-    return pd.NA
-
-
-def get_last(s: Union[pd.NA, pd.Series]):
-    if not s.empty:
-        return s.to_numpy()[-1]
-    return np.nan
-
-
 class BaseLoader(ABC):
 
     FILENAME = ""
+    TIME_KEY = ""
 
     @property
     @abstractmethod
@@ -45,6 +47,11 @@ class BaseLoader(ABC):
     def columns(self) -> list[str]:
         return list(self.column_function_map.keys())
 
+    @property
+    def output_columns(self) -> list[str]:
+        """Names `columns` get once the loader is done with them"""
+        return [self.rename_column(col) for col in self.columns]
+
     @property
     def POST_LOAD_FUNS(self) -> tuple[Callable]:
         """
@@ -53,37 +60,81 @@ class BaseLoader(ABC):
         """
         return (self.rename_columns,)
 
-    def __init__(self, *, base_data_path: str) -> None:
+    def __init__(
+        self,
+        *,
+        base_data_path: str,
+        chunksize: int | None = None,
+        cache: LoaderCache | None = None,
+        store: SensorStore | None = None,
+    ) -> None:
         self.path = os.path.join(base_data_path, self.FILENAME)
+        # Rows per chunk when streaming the file, `None` reads it at once
+        self.chunksize = chunksize
+        self.cache = cache
+        # Sensors missing from the store are still read from their file
+        if store is not None and not store.has(self.dataset):
+            store = None
+        self.store = store
         self.time_parser = None
         self.date_range = None
+        self.bin_width = None
 
     @abstractmethod
     def parse_timekeys(self, *args, **kwargs) -> pd.DataFrame:
         pass
 
+    @property
+    def dataset(self) -> str:
+        """Name of the sensor in a `SensorStore`"""
+        return SensorStore.dataset_name(self.FILENAME)
+
+    @property
+    def source(self) -> str:
+        """File the raw data comes from"""
+        if self.store is not None:
+            return self.store.schema_path(self.dataset)
+        return self.path
+
+    @property
+    def bins(self) -> tuple[pd.DatetimeIndex, pd.Timedelta | None]:
+        """Date range and bin width the raw data gets aggregated into"""
+        return self.date_range, self.bin_width
+
+    @property
+    def time_span(self) -> tuple[pd.Timestamp | None, pd.Timestamp | None]:
+        """Half open time range the bins cover, unbounded if not aggregating"""
+        date_range, bin_width = self.bins
+        if date_range is None:
+            return None, None
+        lefts, rights = bin_edges(date_range, bin_width=bin_width)
+        if not len(lefts):
+            return None, None
+        # Bins include their right edge
+        return pd.Timestamp(lefts[0]), pd.Timestamp(rights[-1]) + pd.Timedelta(1)
+
     def aggregate(
-        self, *, df: pd.DataFrame, date_range: pd.DatetimeIndex
+        self,
+        *,
+        df: pd.DataFrame,
+        date_range: pd.DatetimeIndex,
+        bin_width: pd.Timedelta | None = None,
     ) -> pd.DataFrame:
-        res = pd.DataFrame()
-
-        def _aggregate(s: pd.Series, date_range: pd.DatetimeIndex) -> pd.Series:
-            res = pd.Series(index=date_range)
-            for t, t_next in zip(date_range, date_range[1:]):
-                res[t] = self.column_function_map[s.name](s.loc[t:t_next])
-            return res
+        return aggregate_bins(
+            df,
+            column_function_map=self.column_function_map,
+            date_range=date_range,
+            bin_width=bin_width,
+        )
 
-        for col in self.columns:
-            res[col] = _aggregate(df[col], date_range=date_range)
-        return res
+    def rename_column(self, col: str) -> str:
+        base_name = self.FILENAME.rstrip(".csv").replace(" ", "_") + "_"
+        return base_name + re.sub(
+            pattern=r"\(.*\)", repl="", string=col
+        ).strip().replace(" ", "_")
 
     def rename_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        base_name = self.FILENAME.rstrip(".csv").replace(" ", "_") + "_"
-        df.columns = [
-            base_name
-            + re.sub(pattern=r"\(.*\)", repl="", string=col).strip().replace(" ", "_")
-            for col in df.columns
-        ]
+        df.columns = [self.rename_column(col) for col in df.columns]
         return df
 
     def load(
@@ -91,37 +142,195 @@ class BaseLoader(ABC):
         *,
         time_parser: TimeParser | None = None,
         date_range: pd.DatetimeIndex | None = None,
+        bin_width: pd.Timedelta | None = None,
     ) -> pd.DataFrame:
+        self._check_store(time_parser)
+        # If date_range provided, assume we want to aggregate
+        if date_range is not None:
+            return self.load_resolutions(
+                time_parser=time_parser, bins=[(date_range, bin_width)]
+            )[0]
+
         self.time_parser = time_parser
-        self.date_range = date_range
-        # Load and apply post loading functions
-        df = self._load()
+        self.date_range = None
+        self.bin_width = None
+        return self._post_load(self._parse())
+
+    def load_resolutions(
+        self,
+        *,
+        time_parser: TimeParser | None = None,
+        bins: list[tuple[pd.DatetimeIndex, pd.Timedelta | None]],
+    ) -> list[pd.DataFrame]:
+        """
+        Load the data aggregated into every `(date_range, bin_width)` of
+        `bins`. However many there are, the raw data is parsed and sorted
+        just once, or streamed once feeding all of them.
+        """
+        self._check_store(time_parser)
+        self.time_parser = time_parser
+        res, keys, todo = [], [], []
+        for i, (date_range, bin_width) in enumerate(bins):
+            self.date_range, self.bin_width = date_range, bin_width
+            df, key = None, None
+            if self.cache is not None:
+                key = self.cache_key(bins=date_range_fingerprint(*self.bins))
+                df = self.cache.get(key)
+            if df is None:
+                todo.append((i, self.bins, self.time_span))
+            res.append(df)
+            keys.append(key)
+
+        if todo:
+            indices, todo_bins, spans = zip(*todo)
+            starts, ends = zip(*spans)
+            # Enough raw data for all of them
+            start = None if None in starts else min(starts)
+            end = None if None in ends else max(ends)
+            for i, df in zip(indices, self._aggregate(todo_bins, start, end)):
+                if self.cache is not None:
+                    self.cache.put(keys[i], df)
+                res[i] = df
+
+        for i, (date_range, bin_width) in enumerate(bins):
+            self.date_range, self.bin_width = date_range, bin_width
+            res[i] = self._post_load(res[i])
+        return res
+
+    def cache_key(self, **kwargs) -> str:
+        """Key for the cache entries of this loader, `kwargs` go into it too"""
+        return LoaderCache.make_key(
+            loader=type(self).__name__,
+            source=file_fingerprint(self.source),
+            time=(
+                file_fingerprint(self.time_parser.path)
+                if self.time_parser is not None
+                else None
+            ),
+            columns={
+                col: function_name(fun) for col, fun in self.column_function_map.items()
+            },
+            **kwargs,
+        )
+
+    def _check_store(self, time_parser: TimeParser | None) -> None:
+        """
+        Read the file instead of the store if the store's times were mapped
+        with another version of the time file (or it doesn't tell which)
+        """
+        if self.store is None or time_parser is None:
+            return
+        if not self.store.is_current(self.dataset, time_parser.path):
+            print(
+                f"{self.store.dataset_path(self.dataset)} wasn't built with the "
+                f"current {time_parser.path}, reading {self.path} instead "
+                "(rebuild it with `python -m preprocessing.store`)"
+            )
+            self.store = None
+
+    def _post_load(self, df: pd.DataFrame) -> pd.DataFrame:
         for fun in self.POST_LOAD_FUNS:
             df = fun(df)
         return df
 
-    def _load(
+    def _aggregate(
         self,
+        bins: list[tuple[pd.DatetimeIndex, pd.Timedelta | None]],
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> list[pd.DataFrame]:
+        if self.chunksize is not None:
+            # Stream the file in chunks of `chunksize` rows, folding each one
+            # into every date range as soon as its time keys are parsed
+            aggregators = [
+                StreamingAggregator(
+                    column_function_map=self.column_function_map,
+                    date_range=date_range,
+                    bin_width=bin_width,
+                )
+                for date_range, bin_width in bins
+            ]
+            for chunk in self.parsed_chunks(
+                time_parser=self.time_parser,
+                columns=self.columns,
+                start=start,
+                end=end,
+            ):
+                for aggregator in aggregators:
+                    aggregator.update(chunk)
+            return [aggregator.result() for aggregator in aggregators]
+
+        # Sorted once here, so no date range needs to sort it again
+        df = self._parse(start=start, end=end).sort_index(kind="stable")
+        return [
+            self.aggregate(df=df, date_range=date_range, bin_width=bin_width)
+            for date_range, bin_width in bins
+        ]
+
+    def _parse(
+        self, start: pd.Timestamp | None = None, end: pd.Timestamp | None = None
     ) -> pd.DataFrame:
-        df = pd.read_csv(self.path)
+        """Read the whole file and map its time keys"""
+        if self.store is not None:
+            # Already parsed and just the span that is needed
+            return self.store.read(self.dataset, start=start, end=end)
+
+        if self.cache is not None:
+            key = self.cache_key()
+            df = self.cache.get(key)
+            if df is not None:
+                return df
+
         df = self.parse_timekeys(
             df=pd.read_csv(self.path), time_parser=self.time_parser
         )
-        # If date_range provided, assume we want to aggregate
-        if self.date_range is not None:
-            df = self.aggregate(df=df, date_range=self.date_range)
+
+        if self.cache is not None:
+            self.cache.put(key, df)
         return df
 
+    def parsed_chunks(
+        self,
+        *,
+        time_parser: TimeParser | None = None,
+        columns: list[str] | None = None,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> Generator[pd.DataFrame, None, None]:
+        """
+        Raw data with its time keys mapped, `chunksize` rows at a time, or
+        one fragment of `[start, end)` at a time when reading from the store
+        """
+        if self.store is not None:
+            yield from self.store.fragments(
+                self.dataset, start=start, end=end, columns=columns
+            )
+            return
+
+        usecols = None if columns is None else [self.TIME_KEY] + columns
+        if self.chunksize is None:
+            df = pd.read_csv(self.path, usecols=usecols)
+            yield self.parse_timekeys(df=df, time_parser=time_parser)
+            return
+
+        with pd.read_csv(
+            self.path, chunksize=self.chunksize, usecols=usecols
+        ) as reader:
+            for chunk in reader:
+                yield self.parse_timekeys(df=chunk, time_parser=time_parser)
+
     def __str__(self) -> str:
         pass
 
 
 class BasePhyphoxLoader(BaseLoader):
 
+    TIME_KEY = "Time (s)"
+
     def parse_timekeys(
         self, *, df: pd.DataFrame, time_parser: TimeParser
     ) -> pd.DataFrame:
-        time_key = "Time (s)"
+        time_key = self.TIME_KEY
         df[time_key] = time_parser(timekeys=df[time_key])
         df[time_key] = df[time_key].dt.tz_localize(None)
         df = df.set_index(time_key)
@@ -130,8 +339,10 @@ class BasePhyphoxLoader(BaseLoader):
 
 class BaseAppleWatchLoader(BaseLoader):
 
+    TIME_KEY = "Date/Time"
+
     def parse_timekeys(self, *, df: pd.DataFrame, **kwargs) -> pd.DataFrame:
-        time_key = "Date/Time"
+        time_key = self.TIME_KEY
         df[time_key] = pd.to_datetime(df[time_key])
         return df.set_index(time_key)
 
@@ -253,9 +464,26 @@ class HeartRateLoader(BaseAppleWatchLoader):
     def column_function_map(self) -> dict[str, Callable]:
         return {"Avg (count/min)": median}
 
+    @property
+    def bins(self) -> tuple[pd.DatetimeIndex, pd.Timedelta | None]:
+        # The watch keeps recording during the experiment pauses and the
+        # interpolation below should see those values too, so a date range
+        # skipping the pauses is aggregated over the whole span instead
+        date_range, bin_width = super().bins
+        if bin_width is not None and len(date_range):
+            date_range = pd.date_range(
+                start=date_range[0], end=date_range[-1], freq=bin_width
+            )
+        return date_range, bin_width
+
     @property
     def POST_LOAD_FUNS(self) -> tuple[Callable]:
-        return (self.fillna_hrate,) + super().POST_LOAD_FUNS
+        return (self.fillna_hrate, self.select_date_range) + super().POST_LOAD_FUNS
+
+    def select_date_range(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.date_range is None or df.index.equals(self.date_range):
+            return df
+        return df.reindex(self.date_range)
 
     def fillna_hrate(self, df: pd.DataFrame) -> pd.DataFrame:
         df["Avg (count/min)"] = df["Avg (count/min)"].interpolate(method="time")
@@ -1,13 +1,17 @@
 import argparse
 import os
 from dataclasses import dataclass
+from pathlib import Path
 
 import pandas as pd
 
+from preprocessing.cache import CACHE_DIR, CACHE_SIZE, LoaderCache
 from preprocessing.clean import clean
-from preprocessing.helpers import load_all
+from preprocessing.helpers import load_all_resolutions
+from preprocessing.store import STORE_DIR, SensorStore
 from preprocessing.time_parser import TimeParser
-from utils.parse import BaseArgs, get_base_parser
+from utils.frames import write_frame
+from utils.parse import FRAME_OUTPUT_HELP, BaseArgs, get_base_parser
 
 INPUT_PATH = "data/experiment_1/"
 OUTPUT_PATH = "output/experiment_1/data/preprocessing.csv"
@@ -15,7 +19,18 @@ OUTPUT_PATH = "output/experiment_1/data/preprocessing.csv"
 
 @dataclass
 class Args(BaseArgs):
-    freq: str
+    freq: list[str]
+    chunksize: int | None
+    workers: int
+    executor: str
+    keep_pauses: bool
+    cache_dir: str
+    cache_size: int
+    no_cache: bool
+    clear_cache: bool
+    store: bool
+    interval: int | None
+    float32: bool
 
 
 def parse_freq(_freq: str) -> str:
@@ -23,7 +38,12 @@ def parse_freq(_freq: str) -> str:
 
 
 def parse_args(args: list[str]) -> Args:
-    base_parser = get_base_parser(INPUT_PATH, OUTPUT_PATH)
+    base_parser = get_base_parser(
+        INPUT_PATH,
+        OUTPUT_PATH,
+        "Directory of the experiment, with its raw files and meta/time.csv",
+        FRAME_OUTPUT_HELP,
+    )
     parser = argparse.ArgumentParser(
         prog="preprocessing",
         description="Preprocessing raw files from the experiment.",
@@ -33,36 +53,149 @@ def parse_args(args: list[str]) -> Args:
         "-f",
         "--freq",
         type=parse_freq,
-        help="Frequency to be used to aggregate the data in miliseconds (default %(default)s).",
-        default="1000",
+        nargs="+",
+        help="Frequency to be used to aggregate the data in miliseconds, several ones write one output each, suffixed with their frequency (default %(default)s).",
+        default=[parse_freq("1000")],
+    )
+    parser.add_argument(
+        "-c",
+        "--chunksize",
+        type=int,
+        help="Stream the raw files in chunks of this many rows instead of reading them at once (default %(default)s).",
+        default=None,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Number of sensors to load concurrently (default %(default)s).",
+        default=1,
+    )
+    parser.add_argument(
+        "-e",
+        "--executor",
+        type=str,
+        choices=["thread", "process"],
+        help="Pool used to load the sensors when using more than one worker (default %(default)s).",
+        default="process",
+    )
+    parser.add_argument(
+        "--keep-pauses",
+        action="store_true",
+        help="Aggregate over the whole experiment span, pauses included, instead of just its intervals.",
+    )
+    parser.add_argument(
+        "-s",
+        "--store",
+        action="store_true",
+        help=f"Read the sensors from the store in INPUT_PATH/{STORE_DIR} (see `python -m preprocessing.store`) instead of the raw files.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        help="Preprocess just this experiment interval, counting from 0 (default all of them).",
+        default=None,
+    )
+    parser.add_argument(
+        "--float32",
+        action="store_true",
+        help="Write the data in single precision.",
+    )
+    cache_group = parser.add_argument_group(title="Loader cache handling")
+    cache_group.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory where parsed and aggregated sensor data is cached (default %(default)s).",
+        default=CACHE_DIR,
+    )
+    cache_group.add_argument(
+        "--cache-size",
+        type=int,
+        help="Size limit of the cache in MB, least recently used entries go first (default %(default)s).",
+        default=CACHE_SIZE,
+    )
+    cache_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read from nor write to the cache.",
+    )
+    cache_group.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Empty the cache before running.",
     )
 
     arguments = parser.parse_args(args)
-    return Args(arguments.input, arguments.output, arguments.freq)
+    return Args(
+        arguments.input,
+        arguments.output,
+        arguments.freq,
+        arguments.chunksize,
+        arguments.workers,
+        arguments.executor,
+        arguments.keep_pauses,
+        arguments.cache_dir,
+        arguments.cache_size,
+        arguments.no_cache,
+        arguments.clear_cache,
+        arguments.store,
+        arguments.interval,
+        arguments.float32,
+    )
+
 
+def get_bins(
+    time_parser: TimeParser, freq: str, args: Args
+) -> tuple[pd.DatetimeIndex, pd.Timedelta | None]:
+    # Create date range with custom frequency with the start and end dates of the experiment
+    if args.interval is not None:
+        # Just the bins of a single interval
+        date_range = time_parser.interval_date_range(
+            freq=freq, intervals=[time_parser.intervals[args.interval]]
+        )
+        return date_range, pd.Timedelta(freq)
+    if args.keep_pauses:
+        start, end = time_parser.start, time_parser.end
+        return pd.date_range(start=start, end=end, freq=freq), None
+    # Just the bins inside the experiment intervals, pauses are skipped
+    return time_parser.interval_date_range(freq=freq), pd.Timedelta(freq)
+
+
+def get_output_path(output: Path, freq: str, args: Args) -> Path:
+    if len(args.freq) == 1:
+        return output
+    return output.with_stem(f"{output.stem}_{freq}")
 
-def run(args: Args) -> pd.DataFrame:
+
+def run(args: Args) -> pd.DataFrame | dict[str, pd.DataFrame]:
     print(f"Running preprocessing on {args.input} ...")
 
     # Create a time parser to handle certain rather annoying files
     time_parser = TimeParser(base_data_path=os.path.join(args.input, "meta"))
-    start, end = time_parser.start, time_parser.end
 
-    # Create date range with custom frequency with the start and end dates of the experiment
-    date_range = pd.date_range(start=start, end=end, freq=args.freq)
-
-    # Load, merge and clean the data from all sensors
-    df = clean(
-        load_all(
-            base_data_path=args.input,
-            time_parser=time_parser,
-            date_range=date_range,
-        )
+    cache = LoaderCache(path=args.cache_dir, max_size=args.cache_size)
+    if args.clear_cache:
+        cache.clear()
+
+    # Load and merge the data from all sensors, once for every frequency
+    dfs = load_all_resolutions(
+        base_data_path=args.input,
+        time_parser=time_parser,
+        bins=[get_bins(time_parser, freq, args) for freq in args.freq],
+        chunksize=args.chunksize,
+        cache=None if args.no_cache else cache,
+        store=SensorStore(os.path.join(args.input, STORE_DIR)) if args.store else None,
+        workers=args.workers,
+        executor=args.executor,
     )
 
-    df.to_csv(args.output, index=False)
-    print(f"Results saved to {args.output}")
-    return df
+    res = {}
+    for freq, df in zip(args.freq, dfs):
+        res[freq] = df = clean(df)
+        output = get_output_path(args.output, freq, args)
+        write_frame(df, output, float32=args.float32)
+        print(f"Results saved to {output}")
+    return res[args.freq[0]] if len(args.freq) == 1 else res
 
 
 def main(args: list[str]) -> None:
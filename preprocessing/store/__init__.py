@@ -0,0 +1 @@
+from preprocessing.store.store import STORE_DIR, SensorStore
@@ -0,0 +1,66 @@
+import argparse
+import os
+
+import pandas as pd
+
+from preprocessing.helpers import LOADER_CLASSES
+from preprocessing.store.store import PARTITION, STORE_DIR, SensorStore
+from preprocessing.time_parser import TimeParser
+
+
+def build_store(
+    base_data_path: str,
+    store_path: str,
+    partition: pd.Timedelta = pd.Timedelta(seconds=PARTITION),
+    chunksize: int = 1_000_000,
+) -> SensorStore:
+    """Convert every sensor file of an experiment into `store_path`"""
+    time_parser = TimeParser(base_data_path=os.path.join(base_data_path, "meta"))
+    store = SensorStore(store_path)
+    for loader_class in LOADER_CLASSES:
+        loader = loader_class(base_data_path=base_data_path, chunksize=chunksize)
+        print(f"Storing {loader} ...")
+        store.write(
+            loader.dataset,
+            loader.parsed_chunks(time_parser=time_parser),
+            partition=partition,
+            time_path=time_parser.path,
+        )
+    return store
+
+
+def main(args: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="preprocessing.store",
+        description="Convert the raw files of an experiment into a time partitioned store.",
+    )
+    parser.add_argument(
+        "-i",
+        type=str,
+        help="Experiment directory (default: %(default)s)",
+        default="data/experiment_1/",
+        metavar="INPUT_PATH",
+        dest="input",
+    )
+    parser.add_argument(
+        "-o",
+        type=str,
+        help="Store directory (default: INPUT_PATH/store)",
+        default=None,
+        metavar="OUTPUT_PATH",
+        dest="output",
+    )
+    parser.add_argument(
+        "-p",
+        "--partition",
+        type=int,
+        help="Time span of every partition in seconds (default: %(default)s)",
+        default=PARTITION,
+    )
+    arguments = parser.parse_args(args)
+
+    output = arguments.output or os.path.join(arguments.input, STORE_DIR)
+    build_store(
+        arguments.input, output, partition=pd.Timedelta(seconds=arguments.partition)
+    )
+    print(f"Store saved to {output}")
@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+from typing import Generator, Iterable
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.cache import file_fingerprint
+
+__all__ = (
+    "STORE_DIR",
+    "SensorStore",
+)
+
+STORE_DIR = "store"
+PARTITION = 60  # seconds
+
+
+class SensorStore:
+    """
+    Columnar, time partitioned copy of the sensor files of an experiment
+
+    Every sensor gets its own directory with a `schema.json` and a list of
+    fragments, along with the fingerprint of the `time.csv` its times were
+    mapped with. A fragment holds the rows of one partition (a fixed stretch
+    of time) coming from one chunk of the source, sorted by time, with the
+    times and every column in their own `.npy` file so they can be memory
+    mapped. The schema keeps the time span of every fragment, so reading a
+    time range only touches the fragments overlapping it.
+    """
+
+    SCHEMA = "schema.json"
+    TIME = "time.npy"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    @staticmethod
+    def dataset_name(filename: str) -> str:
+        return os.path.splitext(filename)[0].replace(" ", "_")
+
+    def dataset_path(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def schema_path(self, name: str) -> str:
+        return os.path.join(self.dataset_path(name), self.SCHEMA)
+
+    def has(self, name: str) -> bool:
+        return os.path.exists(self.schema_path(name))
+
+    def schema(self, name: str) -> dict:
+        with open(self.schema_path(name)) as f:
+            return json.load(f)
+
+    def is_current(self, name: str, time_path: str) -> bool:
+        """Whether the times of `name` were mapped with `time_path` as it is now"""
+        return self.schema(name).get("time") == file_fingerprint(time_path)
+
+    def write(
+        self,
+        name: str,
+        chunks: Iterable[pd.DataFrame],
+        partition: pd.Timedelta = pd.Timedelta(seconds=PARTITION),
+        time_path: str | None = None,
+    ) -> None:
+        """
+        Write the time indexed `chunks` as dataset `name`, replacing it if it
+        exists. Their times were mapped with the `time_path` file, if given
+        """
+        path = self.dataset_path(name)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+        step = pd.Timedelta(partition).as_unit("ns").value
+        schema = {
+            "index": None,
+            "columns": None,
+            "time": None if time_path is None else file_fingerprint(time_path),
+            "fragments": [],
+        }
+        for chunk in chunks:
+            if schema["columns"] is None:
+                schema["index"] = chunk.index.name
+                schema["columns"] = list(chunk.columns)
+            times = np.asarray(chunk.index, dtype="datetime64[ns]")
+            order = np.argsort(times, kind="stable")
+            times = times[order]
+            values = chunk.to_numpy(dtype=float)[order]
+            if not len(times):
+                continue
+
+            # Split the chunk at partition boundaries
+            parts = times.view("int64") // step
+            bounds = np.flatnonzero(np.diff(parts)) + 1
+            for start, end in zip(
+                np.r_[0, bounds].astype(int), np.r_[bounds, len(times)].astype(int)
+            ):
+                fragment = f"{parts[start]:012d}-{len(schema['fragments']):06d}"
+                os.makedirs(os.path.join(path, fragment))
+                np.save(os.path.join(path, fragment, self.TIME), times[start:end])
+                for k in range(values.shape[1]):
+                    np.save(
+                        os.path.join(path, fragment, f"{k}.npy"),
+                        np.ascontiguousarray(values[start:end, k]),
+                    )
+                schema["fragments"].append(
+                    {
+                        "name": fragment,
+                        "start": int(times[start].view("int64")),
+                        "end": int(times[end - 1].view("int64")),
+                        "rows": int(end - start),
+                    }
+                )
+
+        # Written last, a dataset without schema is an unfinished one
+        tmp = self.schema_path(name) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(schema, f, indent=4)
+        os.replace(tmp, self.schema_path(name))
+
+    def fragments(
+        self,
+        name: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        columns: list[str] | None = None,
+    ) -> Generator[pd.DataFrame, None, None]:
+        """Rows of `name` in `[start, end)`, one frame per overlapping fragment"""
+        schema = self.schema(name)
+        columns = schema["columns"] if columns is None else columns
+        ks = [schema["columns"].index(col) for col in columns]
+        lo = -np.inf if start is None else pd.Timestamp(start).as_unit("ns").value
+        hi = np.inf if end is None else pd.Timestamp(end).as_unit("ns").value
+
+        for fragment in schema["fragments"]:
+            if fragment["end"] < lo or fragment["start"] >= hi:
+                continue
+            path = os.path.join(self.dataset_path(name), fragment["name"])
+            times = np.load(os.path.join(path, self.TIME), mmap_mode="r")
+            # Fragments are sorted, so the range is a contiguous slice
+            first, last = 0, len(times)
+            if start is not None:
+                first = np.searchsorted(times, np.datetime64(lo, "ns"))
+            if end is not None:
+                last = np.searchsorted(times, np.datetime64(hi, "ns"))
+
+            data = {
+                col: np.load(os.path.join(path, f"{k}.npy"), mmap_mode="r")
+                for col, k in zip(columns, ks)
+            }
+            yield pd.DataFrame(
+                {col: values[first:last] for col, values in data.items()},
+                index=pd.DatetimeIndex(times[first:last], name=schema["index"]),
+            )
+
+    def read(
+        self,
+        name: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        columns: list[str] | None = None,
+    ) -> pd.DataFrame:
+        """Rows of `name` in `[start, end)`"""
+        dfs = list(self.fragments(name, start=start, end=end, columns=columns))
+        if not dfs:
+            schema = self.schema(name)
+            return pd.DataFrame(
+                columns=schema["columns"] if columns is None else columns,
+                index=pd.DatetimeIndex(
+                    [], name=schema["index"], dtype="datetime64[ns]"
+                ),
+                dtype=float,
+            )
+        return pd.concat(dfs)
@@ -1,6 +1,7 @@
 import os
 from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
 
 
@@ -31,41 +32,86 @@ class TimeParser:
     def __init__(self, base_data_path: str) -> None:
         self.path = os.path.join(base_data_path, self.FILENAME)
         self.intervals = self.extract_intervals()
+        # Interval boundaries in experiment time, ordered as `intervals`
+        self._starts = pd.TimedeltaIndex(
+            [i.start.exp for i in self.intervals]
+        ).to_numpy(dtype="timedelta64[ns]")
+        self._ends = pd.TimedeltaIndex([i.end.exp for i in self.intervals]).to_numpy(
+            dtype="timedelta64[ns]"
+        )
         self.start = min(self.intervals, key=lambda x: x.start.real).start.real
         self.end = max(self.intervals, key=lambda x: x.end.real).end.real
 
-    def extract_intervals(self) -> tuple[Interval]:
-        res = tuple()
+    def extract_intervals(self) -> list[Interval]:
         df = pd.read_csv(self.path)
         subset_cols = ["experiment time", "system time text"]
         # start happens every two rows, same for pause
         start, pause = df[::2], df[1::2]
-        for (start_exp, start_real), (pause_exp, pause_real) in zip(
-            start[subset_cols].values, pause[subset_cols].values
-        ):
-            res += (
-                Interval(
-                    start=TimeTuple(exp=start_exp, real=start_real),
-                    end=TimeTuple(exp=pause_exp, real=pause_real),
-                ),
+        res = [
+            Interval(
+                start=TimeTuple(exp=start_exp, real=start_real),
+                end=TimeTuple(exp=pause_exp, real=pause_real),
             )
+            for (start_exp, start_real), (pause_exp, pause_real) in zip(
+                start[subset_cols].values, pause[subset_cols].values
+            )
+        ]
 
         return sorted(res, key=lambda x: x.start.real)
 
     def parse_times(self, timekeys: pd.Series) -> pd.Series:
+        """
+        Map experiment times to real times, dropping the ones that lie in no
+        interval. Rows come out grouped by interval (in `intervals` order)
+        and keep their original order within each interval. Intervals are
+        assumed not to overlap in experiment time.
+        """
         timekeys = pd.to_timedelta(timekeys, unit="s")
-        joined_intervals = []
-        for interval in self.intervals:
-            joined_intervals.append(
-                # Take just the slice of the original timekeys that lie inside the interval
-                timekeys[
-                    (timekeys >= interval.start.exp) & (timekeys < interval.end.exp)
-                ]
-                # Take into account the start time of the interval as an offset
-                + (interval.start.real - interval.start.exp)
-            )
-
-        return pd.concat(joined_intervals)
+        values = timekeys.to_numpy(dtype="timedelta64[ns]")
+
+        # Find the candidate interval of every key with a single sorted search
+        by_start = np.argsort(self._starts, kind="stable")
+        pos = np.searchsorted(self._starts[by_start], values, side="right") - 1
+        inside = (pos >= 0) & ~np.isnat(values)
+        which = np.full(len(values), -1)
+        which[inside] = by_start[pos[inside]]
+        inside[inside] = values[inside] < self._ends[which[inside]]
+
+        # Take just the keys that lie inside an interval, grouped by interval
+        rows = np.flatnonzero(inside)
+        rows = rows[np.argsort(which[rows], kind="stable")]
+
+        # Take into account the start time of the interval as an offset
+        offsets = pd.DatetimeIndex(
+            [i.start.real - i.start.exp for i in self.intervals]
+        ).as_unit("ns")
+        return timekeys.iloc[rows] + offsets[which[rows]].to_numpy()
+
+    def interval_date_range(
+        self, freq: str, intervals: list[Interval] | None = None
+    ) -> pd.DatetimeIndex:
+        """
+        Labels of `pd.date_range(start, end, freq)` whose bin, `freq` wide,
+        overlaps some interval (of `intervals` if given), so the pauses get
+        no bins. The last label of the full range is left out as it closes
+        a bin but starts none.
+        """
+        full_range = pd.date_range(start=self.start, end=self.end, freq=freq)
+        step = pd.Timedelta(freq)
+
+        def ceil_div(a: pd.Timedelta, b: pd.Timedelta) -> int:
+            return -(-a // b)
+
+        labels = []
+        for interval in self.intervals if intervals is None else intervals:
+            # Real times parsed keys can take within this interval
+            start = interval.start.real
+            end = start + (interval.end.exp - interval.start.exp)
+            first = max(ceil_div(start - self.start, step) - 1, 0)
+            last = min(ceil_div(end - self.start, step) - 1, len(full_range) - 2)
+            labels.append(np.arange(first, last + 1))
+
+        return full_range[np.unique(np.concatenate(labels or [[]]).astype(int))]
 
     def __call__(self, timekeys: pd.Series) -> pd.Series:
         return self.parse_times(timekeys=timekeys)
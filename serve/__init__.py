@@ -0,0 +1 @@
+from serve.run import main
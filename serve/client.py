@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from serve.run import HOST, PORT
+from utils.frames import read_frame
+from utils.parse import parse_input_path
+
+__all__ = (
+    "PredictionClient",
+    "encode_rows",
+)
+
+
+def encode_rows(rows: pd.DataFrame) -> bytes:
+    """Request body with `rows`, floats as Python writes them (read back exactly)"""
+    return json.dumps({"rows": rows.to_dict(orient="records")}, default=str).encode()
+
+
+class PredictionClient:
+    """Client of `serve.service.PredictionService` over one keep-alive connection"""
+
+    def __init__(self, host: str = HOST, port: int = PORT) -> None:
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def __aenter__(self) -> "PredictionClient":
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def request(
+        self, method: str, path: str, body: bytes = b""
+    ) -> tuple[int, dict]:
+        self.writer.write(
+            (
+                f"{method} {path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "\r\n"
+            ).encode()
+            + body
+        )
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while (header := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = header.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def predict(self, rows: pd.DataFrame) -> np.ndarray:
+        """Predictions for rows of features"""
+        return await self.post("/predict", encode_rows(rows))
+
+    async def ingest(self, rows: pd.DataFrame) -> np.ndarray:
+        """Predictions for the next rows of aggregated sensor data"""
+        return await self.post("/ingest", encode_rows(rows))
+
+    async def stats(self) -> dict:
+        return (await self.request("GET", "/stats"))[1]
+
+    async def post(self, path: str, body: bytes) -> np.ndarray:
+        """Predictions for rows already encoded by `encode_rows`"""
+        status, response = await self.request("POST", path, body)
+        if status != 200:
+            raise ValueError(f"{path} failed with {status}: {response['error']}")
+        return np.array(response["predictions"], dtype=np.float64)
+
+
+############################## LOAD TEST ##############################
+@dataclass
+class Args:
+    input: Path
+    raw: bool
+    host: str
+    port: int
+    clients: int
+    rows: int
+
+
+def parse_args(args: list[str]) -> Args:
+    parser = argparse.ArgumentParser(
+        prog="serve.client",
+        description="Send the rows of INPUT_PATH to a running prediction service, from several concurrent clients, and report the latencies.",
+    )
+    parser.add_argument(
+        "-i",
+        type=parse_input_path,
+        help="Frame with rows of features, or of aggregated sensor data with --raw",
+        metavar="INPUT_PATH",
+        dest="input",
+        required=True,
+    )
+    parser.add_argument(
+        "-r",
+        "--raw",
+        action="store_true",
+        help="Rows of INPUT_PATH are aggregated sensor data, sent in order by a single client.",
+    )
+    parser.add_argument("--host", type=str, default=HOST, help="(default %(default)s)")
+    parser.add_argument("--port", type=int, default=PORT, help="(default %(default)s)")
+    parser.add_argument(
+        "-c",
+        "--clients",
+        type=int,
+        help="Number of concurrent clients (default %(default)s).",
+        default=8,
+    )
+    parser.add_argument(
+        "-n",
+        "--rows",
+        type=int,
+        help="Rows per request (default %(default)s).",
+        default=1,
+    )
+
+    arguments = parser.parse_args(args)
+    return Args(
+        arguments.input,
+        arguments.raw,
+        arguments.host,
+        arguments.port,
+        1 if arguments.raw else arguments.clients,
+        arguments.rows,
+    )
+
+
+async def send_requests(
+    args: Args, requests: list[bytes]
+) -> tuple[list[float], np.ndarray]:
+    """Latencies of the requests and predictions of all of their rows"""
+    latencies, predictions = [], [None] * len(requests)
+    path = "/ingest" if args.raw else "/predict"
+
+    async def client(first: int) -> None:
+        async with PredictionClient(args.host, args.port) as client:
+            for i in range(first, len(requests), args.clients):
+                start = time.perf_counter()
+                predictions[i] = await client.post(path, requests[i])
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    return latencies, np.concatenate(predictions)
+
+
+async def load_test(args: Args) -> dict:
+    df = read_frame(args.input)
+    # Encoded up front, all clients share one loop and encoding would make them
+    # wait on each other (and be measured as latency)
+    requests = [
+        encode_rows(df.iloc[i : i + args.rows]) for i in range(0, len(df), args.rows)
+    ]
+
+    start = time.perf_counter()
+    latencies, predictions = await send_requests(args, requests)
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+
+    async with PredictionClient(args.host, args.port) as client:
+        server = await client.stats()
+    return {
+        "requests": len(requests),
+        "rows": len(df),
+        "predicted_rows": int(np.isfinite(predictions).sum()),
+        "p50_ms": float(p50),
+        "p99_ms": float(p99),
+        "requests_per_s": len(requests) / elapsed,
+        "rows_per_s": len(df) / elapsed,
+        "server": server,
+    }
+
+
+def main(args: list[str]) -> None:
+    print(json.dumps(asyncio.run(load_test(parse_args(args))), indent=4))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+from dataclasses import dataclass
+from pathlib import Path
+
+from fe.incremental import load_pca_model
+from fe.online import OnlineFeatures
+from models.base import load_pipeline
+from serve.service import PredictionService
+from utils.columns import Columns
+from utils.parse import parse_input_path
+
+INPUT_PATH = "output/experiment_1/models/knn_pipeline.joblib"
+HOST = "127.0.0.1"
+PORT = 8765
+
+
+@dataclass
+class Args:
+    input: Path
+    raw: Path | None
+    host: str
+    port: int
+    max_batch: int
+    max_delay: float
+
+
+def parse_args(args: list[str]) -> Args:
+    parser = argparse.ArgumentParser(
+        prog="serve",
+        description="Serve the heart rate predictions of a fitted model over HTTP, see serve.service.PredictionService for the API.",
+    )
+    parser.add_argument(
+        "-i",
+        type=parse_input_path,
+        help="Pipeline saved by a model run (default: %(default)s)",
+        default=INPUT_PATH,
+        metavar="INPUT_PATH",
+        dest="input",
+    )
+    parser.add_argument(
+        "-r",
+        "--raw",
+        type=parse_input_path,
+        help="Also take rows of aggregated sensor data, computing their features like the feature engineering output the model was trained on (and with its PCA).",
+        default=None,
+        metavar="FE_OUTPUT_PATH",
+    )
+    parser.add_argument("--host", type=str, default=HOST, help="(default %(default)s)")
+    parser.add_argument("--port", type=int, default=PORT, help="(default %(default)s)")
+    parser.add_argument(
+        "--max-batch",
+        type=int,
+        help="Most rows predicted at once, concurrent requests are grouped up to it (default %(default)s).",
+        default=256,
+    )
+    parser.add_argument(
+        "--max-delay",
+        type=float,
+        help="Most time in miliseconds that a request waits for others to be grouped with (default %(default)s).",
+        default=2,
+    )
+
+    arguments = parser.parse_args(args)
+    return Args(
+        arguments.input,
+        arguments.raw,
+        arguments.host,
+        arguments.port,
+        arguments.max_batch,
+        arguments.max_delay / 1000,
+    )
+
+
+def run(args: Args) -> None:
+    pipeline = load_pipeline(args.input)
+    online = None
+    if args.raw is not None:
+        online = OnlineFeatures(
+            Columns.get_feature_columns(), pca_model=load_pca_model(args.raw)
+        )
+
+    service = PredictionService(pipeline, online, args.max_batch, args.max_delay)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(args: list[str]) -> None:
+    run(parse_args(args))
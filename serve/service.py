@@ -0,0 +1,317 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from fe.online import OnlineFeatures
+from models.base import FittedPipeline
+
+__all__ = (
+    "LatencyStats",
+    "MicroBatcher",
+    "PredictionService",
+)
+
+# Last requests kept for the percentiles and the throughput
+LATENCY_WINDOW = 10_000
+
+
+class LatencyStats:
+    """
+    Request counters, and latency percentiles and throughput over the last
+    requests. The throughput is taken over the time those were being served,
+    from the first one coming to the last one answered, so the time the
+    service sat idle before them doesn't count
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self.started = time.perf_counter()
+        # (answered at, latency, rows) of the last requests
+        self.recent = deque(maxlen=window)
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+
+    def add(self, latency: float, rows: int) -> None:
+        self.recent.append((time.perf_counter(), latency, rows))
+        self.requests += 1
+        self.rows += rows
+
+    def summary(self) -> dict[str, float]:
+        # null (not NaN, which isn't JSON) until a request has been served
+        p50 = p99 = requests_per_s = rows_per_s = None
+        if self.recent:
+            answered, latencies, rows = np.array(self.recent).T
+            p50, p99 = (float(p) for p in np.percentile(latencies, [50, 99]) * 1000)
+            busy = answered.max() - (answered - latencies).min()
+            requests_per_s = float(len(self.recent) / busy)
+            rows_per_s = float(rows.sum()) / busy
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "errors": self.errors,
+            "p50_ms": p50,
+            "p99_ms": p99,
+            "requests_per_s": requests_per_s,
+            "rows_per_s": rows_per_s,
+            "uptime_s": time.perf_counter() - self.started,
+        }
+
+
+class MicroBatcher:
+    """
+    Groups the rows of concurrent `predict` calls into one call of the
+    pipeline. A batch is sent once it has `max_rows` rows or `max_delay`
+    seconds after its first rows came, whichever is first, and is predicted
+    in a thread so requests keep coming in meanwhile
+    """
+
+    def __init__(
+        self,
+        pipeline: FittedPipeline,
+        stats: LatencyStats,
+        max_rows: int = 256,
+        max_delay: float = 0.002,
+    ) -> None:
+        self.pipeline = pipeline
+        self.stats = stats
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.queue: asyncio.Queue[tuple[np.ndarray, asyncio.Future]] = asyncio.Queue()
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+    async def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predictions for the rows of `X`, with the columns of the pipeline"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((X, future))
+        return await future
+
+    async def _next_batch(self) -> list[tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        n_rows = len(batch[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while n_rows < self.max_rows:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                y = await self._predict(np.concatenate([X for X, _ in batch]))
+            except Exception as e:
+                if len(batch) == 1:
+                    _, future = batch[0]
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                # Each request on its own, so only the faulty ones fail
+                for X, future in batch:
+                    try:
+                        result = await self._predict(X)
+                    except Exception as e:
+                        result = e
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+                continue
+
+            offset = 0
+            for X, future in batch:
+                if not future.done():
+                    future.set_result(y[offset : offset + len(X)])
+                offset += len(X)
+
+    async def _predict(self, X: np.ndarray) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        y = await loop.run_in_executor(None, self.pipeline.pipeline.predict, X)
+        self.stats.batches += 1
+        return y
+
+
+class PredictionService:
+    """
+    Heart rate predictions of a fitted pipeline over a small HTTP/1.1 API,
+    on keep-alive connections with JSON bodies:
+
+    - `POST /predict` with `{"rows": [{column: value, ...}, ...]}`, rows of
+      features (f.e. of the feature engineering output), answers
+      `{"predictions": [...]}`
+    - `POST /ingest` with rows of aggregated sensor data (the preprocessing
+      output) as they come, one stream for the whole service. Their features
+      are computed online, `null` while the windows fill up. Rows with
+      missing features are refused, as the cleaned output has none
+    - `GET /stats` request counters, p50/p99 latency and throughput of the
+      last requests
+
+    Raw rows need the `online` features, built with the PCA model of the
+    feature engineering run that the pipeline was trained on
+    """
+
+    def __init__(
+        self,
+        pipeline: FittedPipeline,
+        online: OnlineFeatures | None = None,
+        max_rows: int = 256,
+        max_delay: float = 0.002,
+    ) -> None:
+        self.pipeline = pipeline
+        self.online = online
+        self.stats = LatencyStats()
+        self.batcher = MicroBatcher(pipeline, self.stats, max_rows, max_delay)
+
+    async def serve(self, host: str, port: int) -> None:
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving predictions on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            print(json.dumps(self.stats.summary(), indent=4))
+
+    async def predict(self, rows: list[dict]) -> np.ndarray:
+        # Straight to an array, a frame per request takes longer than the model
+        X = np.array(
+            [[row[column] for column in self.pipeline.columns] for row in rows],
+            dtype=np.float64,
+        ).reshape(len(rows), len(self.pipeline.columns))
+        # Checked here, a bad row would fail the batch of every other request
+        if not len(X):
+            raise ValueError("No rows to predict")
+        missing = np.flatnonzero(~np.isfinite(X).all(axis=1))
+        if len(missing):
+            raise ValueError(f"Rows {missing.tolist()} have missing features")
+        return await self.batcher.predict(X)
+
+    async def ingest(self, rows: list[dict]) -> np.ndarray:
+        if self.online is None:
+            raise ValueError("This service wasn't started with raw rows support")
+        rows = pd.DataFrame.from_records(rows)
+        # Checked before they reach the online state, a NaN (f.e. an empty bin
+        # that wasn't interpolated) would stay in its filters for good
+        X = rows[self.online.feature_columns].to_numpy(dtype=np.float64)
+        missing = np.flatnonzero(~np.isfinite(X).all(axis=1))
+        if len(missing):
+            raise ValueError(f"Rows {missing.tolist()} have missing features")
+        # Raw rows are a single stream, updated in the order requests come (no
+        # await in between)
+        features = pd.concat([rows, self.online.update(rows)], axis=1)
+        X = features[self.pipeline.columns].to_numpy(dtype=np.float64)
+        # Rows still filling the windows don't have all of their features
+        valid = np.isfinite(X).all(axis=1)
+        y = np.full(len(rows), np.nan)
+        if valid.any():
+            y[valid] = await self.batcher.predict(X[valid])
+        return y
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except ValueError as e:
+                    # Where the next request starts is unknown, so it's the last
+                    self.stats.errors += 1
+                    writer.write(http_response(400, {"error": repr(e)}))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, body = request
+                status, response = await self.route(method, path, body)
+                writer.write(http_response(status, response))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        if method == "GET" and path == "/stats":
+            return 200, self.stats.summary()
+        if method != "POST" or path not in ("/predict", "/ingest"):
+            return 404, {"error": f"No {method} {path}"}
+
+        start = time.perf_counter()
+        try:
+            rows = json.loads(body)["rows"]
+            if path == "/predict":
+                y = await self.predict(rows)
+            else:
+                y = await self.ingest(rows)
+        except (ValueError, KeyError, TypeError) as e:
+            self.stats.errors += 1
+            return 400, {"error": repr(e)}
+        except Exception as e:
+            self.stats.errors += 1
+            return 500, {"error": repr(e)}
+        self.stats.add(time.perf_counter() - start, len(rows))
+        return 200, {"predictions": [None if np.isnan(v) else float(v) for v in y]}
+
+
+async def read_request(
+    reader: asyncio.StreamReader,
+) -> tuple[str, str, bytes] | None:
+    """
+    Method, path and body of the next request, None once the client is gone.
+    Raises a `ValueError` if it isn't a request
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ValueError(f"Malformed request line {line!r}")
+    method, path, _ = parts
+    length = 0
+    while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = header.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+            if length < 0:
+                raise ValueError(f"Negative Content-Length {length}")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+
+def http_response(status: int, content: dict) -> bytes:
+    body = json.dumps(content).encode()
+    reason = {
+        200: "OK",
+        400: "Bad Request",
+        404: "Not Found",
+        500: "Internal Server Error",
+    }[status]
+    return (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "\r\n"
+    ).encode() + body
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.aggregation import (
+    StreamingAggregator,
+    aggregate_bins,
+    get_last,
+    median,
+)
+
+COLUMN_FUNCTION_MAP = {"x": median, "y": median, "z": get_last}
+
+
+def loc_aggregate(df: pd.DataFrame, date_range: pd.DatetimeIndex) -> pd.DataFrame:
+    """Bins as the loaders used to aggregate them, with `s.loc[t:t_next]`"""
+    res = pd.DataFrame(np.nan, index=date_range, columns=list(COLUMN_FUNCTION_MAP))
+    for col, fun in COLUMN_FUNCTION_MAP.items():
+        for t, t_next in zip(date_range, date_range[1:]):
+            value = fun(df[col].loc[t:t_next])
+            # Empty bins, left as NaN
+            res.loc[t, col] = np.nan if value is pd.NA else value
+    return res
+
+
+def raw_samples(seed: int) -> tuple[pd.DataFrame, pd.DatetimeIndex]:
+    """Samples in time order, some on the bin edges, repeated or NaN"""
+    rng = np.random.default_rng(seed)
+    date_range = pd.date_range("2024-05-01 10:00", periods=30, freq="1s")
+    offsets = np.sort(rng.uniform(-2, 32, size=200))
+    # Exactly on some edges, and several samples at the same time
+    offsets[rng.choice(len(offsets), 20, replace=False)] = rng.integers(0, 30, 20)
+    offsets = np.sort(np.append(offsets, offsets[:10]))
+    # No samples in a few bins
+    offsets = offsets[(offsets < 12) | (offsets > 15)]
+    index = date_range[0] + pd.to_timedelta(offsets, unit="s")
+
+    df = pd.DataFrame(
+        rng.normal(size=(len(index), len(COLUMN_FUNCTION_MAP))),
+        index=index,
+        columns=list(COLUMN_FUNCTION_MAP),
+    )
+    df.iloc[rng.choice(len(df), 30, replace=False), 0] = np.nan
+    df.iloc[rng.choice(len(df), 30, replace=False), 2] = np.nan
+    return df, date_range
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_aggregate_bins_matches_loc(seed: int) -> None:
+    df, date_range = raw_samples(seed)
+    pd.testing.assert_frame_equal(
+        aggregate_bins(df, COLUMN_FUNCTION_MAP, date_range),
+        loc_aggregate(df, date_range),
+        check_freq=False,
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("chunksize", [1, 7, 64, 1000])
+def test_streaming_aggregator_matches_loc(seed: int, chunksize: int) -> None:
+    df, date_range = raw_samples(seed)
+    aggregator = StreamingAggregator(COLUMN_FUNCTION_MAP, date_range)
+    for start in range(0, len(df), chunksize):
+        aggregator.update(df.iloc[start : start + chunksize])
+    pd.testing.assert_frame_equal(
+        aggregator.result(), loc_aggregate(df, date_range), check_freq=False
+    )
+
+
+def test_streaming_aggregator_rejects_samples_back_in_time() -> None:
+    df, date_range = raw_samples(0)
+    aggregator = StreamingAggregator(COLUMN_FUNCTION_MAP, date_range)
+    aggregator.update(df.iloc[100:])
+    with pytest.raises(ValueError):
+        aggregator.update(df.iloc[:100])
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.signal import butter, filtfilt
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from fe.config import CUTOFF_FREQUENCIES
+from fe.helpers import add_pca, add_signal_cutoff, pca_columns, signal_cutoff_columns
+
+FEATURE_COLUMNS = ["a", "b", "c", "d"]
+
+
+def filtfilt_cutoff(df: pd.DataFrame, fs: int = 100) -> pd.DataFrame:
+    """Filtered columns as add_signal_cutoff used to compute them, one by one"""
+    res = {}
+    for cutoff in CUTOFF_FREQUENCIES:
+        b, a = butter(4, cutoff / (0.5 * fs), btype="low", analog=False)
+        for column in FEATURE_COLUMNS:
+            res[f"{column}_filtered_{cutoff}Hz"] = filtfilt(b, a, df[column])
+    return pd.DataFrame(res, index=df.index)
+
+
+def separate_pca(df: pd.DataFrame, sizes: list[int]) -> pd.DataFrame:
+    """Components as add_pca used to compute them, a scaler and PCA per size"""
+    scaled_features = StandardScaler().fit_transform(df[FEATURE_COLUMNS])
+    return pd.concat(
+        [
+            pd.DataFrame(
+                PCA(n_components=size).fit_transform(scaled_features),
+                columns=[f"pca_{size}_component_{i+1}" for i in range(size)],
+            )
+            for size in sizes
+        ],
+        axis="columns",
+    )
+
+
+def sensor_frame(seed: int, n_rows: int = 500) -> pd.DataFrame:
+    """Slow oscillations with noise, on top of an offset, like sensor data"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_rows)[:, None] / 100
+    signal = np.sin(2 * np.pi * rng.uniform(0.1, 3, size=len(FEATURE_COLUMNS)) * t)
+    values = 5 * rng.normal(size=len(FEATURE_COLUMNS)) + signal
+    values += rng.normal(scale=0.3, size=values.shape)
+    return pd.DataFrame(values, columns=FEATURE_COLUMNS)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_signal_cutoff_matches_filtfilt(seed: int) -> None:
+    df = sensor_frame(seed)
+    res = add_signal_cutoff(df, FEATURE_COLUMNS)
+    expected = filtfilt_cutoff(df)
+
+    columns = [
+        column
+        for cutoff in CUTOFF_FREQUENCIES
+        for column in signal_cutoff_columns(FEATURE_COLUMNS, cutoff)
+    ]
+    assert list(res.columns) == FEATURE_COLUMNS + columns
+    # The (b, a) form of the old filter rounds off at about 1e-6 relative
+    np.testing.assert_allclose(
+        res[columns].to_numpy(), expected[columns].to_numpy(), rtol=1e-6, atol=1e-6
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("n_rows", [30, 500])
+def test_sliced_pca_matches_separate_fits(seed: int, n_rows: int) -> None:
+    df = sensor_frame(seed, n_rows)
+    sizes = [1, 2, 4]
+    res = add_pca(df, FEATURE_COLUMNS, n_components=sizes)
+
+    assert list(res.columns) == FEATURE_COLUMNS + pca_columns(sizes)
+    np.testing.assert_allclose(
+        res[pca_columns(sizes)].to_numpy(),
+        separate_pca(df, sizes).to_numpy(),
+        rtol=1e-9,
+        atol=1e-9,
+    )
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsRegressor
+
+from models.knn.neighbors import NeighborsRegressor
+
+
+def regression_data(seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, 3))
+    return X, X.sum(axis=1) + rng.normal(scale=0.1, size=300)
+
+
+@pytest.mark.parametrize("algorithm", ["auto", "brute"])
+def test_float32_searches_by_brute_force(algorithm: str) -> None:
+    X, y = regression_data()
+    model = NeighborsRegressor(algorithm=algorithm, float32=True)
+    params = model.get_params()
+    model.fit(X, y)
+
+    assert model.get_params() == params
+    assert model._fit_method == "brute"
+    assert model._fit_X.dtype == np.float32
+    expected = KNeighborsRegressor(algorithm="brute").fit(X.astype(np.float32), y)
+    np.testing.assert_array_equal(
+        model.predict(X), expected.predict(X.astype(np.float32))
+    )
+
+
+@pytest.mark.parametrize("algorithm", ["kd_tree", "ball_tree"])
+def test_float32_refuses_trees(algorithm: str) -> None:
+    X, y = regression_data()
+    with pytest.raises(ValueError):
+        NeighborsRegressor(algorithm=algorithm, float32=True).fit(X, y)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "manhattan"])
+def test_probing_every_list_is_exact(metric: str) -> None:
+    X, y = regression_data()
+    model = NeighborsRegressor(metric=metric, n_lists=8, n_probe=8).fit(X, y)
+    expected = KNeighborsRegressor(metric=metric).fit(X, y)
+    np.testing.assert_allclose(model.predict(X), expected.predict(X))
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.signal import sosfilt, sosfilt_zi
+
+from fe.helpers import butterworth_sos
+from fe.online import CausalLowPass, OnlineFeatures
+
+FEATURE_COLUMNS = ["a", "b"]
+
+
+def stream(seed: int = 0, n_rows: int = 50) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(size=(n_rows, 2)), columns=FEATURE_COLUMNS)
+
+
+def test_low_pass_matches_sosfilt() -> None:
+    rows = stream().to_numpy()
+    sos = butterworth_sos(1.5, 100)
+    expected, _ = sosfilt(sos, rows, axis=0, zi=sosfilt_zi(sos)[:, :, None] * rows[0])
+
+    low_pass = CausalLowPass(2, 1.5)
+    res = np.concatenate([low_pass.update(rows[i : i + 7]) for i in range(0, 50, 7)])
+    np.testing.assert_allclose(res, expected)
+
+
+def test_low_pass_rejects_nan_and_keeps_its_state() -> None:
+    rows = stream().to_numpy()
+    expected = CausalLowPass(2, 1.5).update(rows)
+
+    low_pass = CausalLowPass(2, 1.5)
+    first = low_pass.update(rows[:10])
+    bad = rows[10:20].copy()
+    bad[3, 1] = np.nan
+    with pytest.raises(ValueError):
+        low_pass.update(bad)
+    # Later rows are still filtered, as if the bad ones never came
+    np.testing.assert_allclose(
+        np.concatenate([first, low_pass.update(rows[10:])]), expected
+    )
+
+
+def test_online_features_reject_nan_before_any_update() -> None:
+    df = stream()
+    expected = OnlineFeatures(FEATURE_COLUMNS).update(df)
+
+    online = OnlineFeatures(FEATURE_COLUMNS)
+    first = online.update(df.iloc[:20])
+    bad = df.iloc[20:30].copy()
+    bad.iloc[2, 0] = np.nan
+    with pytest.raises(ValueError):
+        online.update(bad)
+    pd.testing.assert_frame_equal(
+        pd.concat([first, online.update(df.iloc[20:])]), expected
+    )
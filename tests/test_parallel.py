@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from fe.builder import FeatureMatrix
+from fe.helpers import (
+    centrality_window_columns,
+    dominant_frequency_columns,
+    pca_columns,
+    signal_cutoff_columns,
+)
+from fe.parallel import compute_features
+
+FEATURE_COLUMNS = ["a", "b", "c", "d"]
+
+
+def feature_schema() -> dict:
+    """A part of every feature family"""
+    return {
+        ("pca", (2, 3)): pca_columns((2, 3)),
+        ("centrality_window", 10): centrality_window_columns(FEATURE_COLUMNS, 10),
+        ("dominant_frequency", 15): dominant_frequency_columns(FEATURE_COLUMNS, 15),
+        ("signal_cutoff", 1.5): signal_cutoff_columns(FEATURE_COLUMNS, 1.5),
+    }
+
+
+def features(seed: int, n_rows: int = 400) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.normal(size=(n_rows, len(FEATURE_COLUMNS))), axis=0)
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_parallel_features_match_serial(workers: int) -> None:
+    block = features(workers)
+    serial, parallel = (FeatureMatrix(len(block), feature_schema()) for _ in range(2))
+    compute_features(block, serial)
+    compute_features(block, parallel, workers=workers)
+    np.testing.assert_array_equal(parallel.block, serial.block)
+
+
+def test_parallel_features_of_last_rows_match_serial() -> None:
+    block = features(0)
+    schema = feature_schema()
+    del schema["pca", (2, 3)]
+    # Only some feature columns for the windows, the rest of the rows as history
+    inputs = {("centrality_window", 10): [1, 3]}
+    schema["centrality_window", 10] = centrality_window_columns(["b", "d"], 10)
+
+    serial, parallel = (FeatureMatrix(50, schema) for _ in range(2))
+    compute_features(block, serial, inputs=inputs)
+    compute_features(block, parallel, inputs=inputs, workers=2)
+    np.testing.assert_array_equal(parallel.block, serial.block)
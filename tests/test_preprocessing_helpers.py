@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.helpers import join_all
+
+
+def merge_all(dfs: list[pd.DataFrame], date_range: pd.DatetimeIndex) -> pd.DataFrame:
+    """Loader outputs as load_all used to join them, one merge at a time"""
+    res = pd.DataFrame(index=date_range)
+    for df in dfs:
+        res = res.merge(df, right_index=True, left_index=True)
+    return res.reset_index(names="Time")
+
+
+def loader_outputs(
+    seed: int,
+) -> tuple[list[pd.DataFrame], list[list[str]], pd.DatetimeIndex]:
+    """Outputs of a few loaders on the same bins, with their empty ones NaN"""
+    rng = np.random.default_rng(seed)
+    date_range = pd.date_range("2024-05-01 10:00", periods=50, freq="1s")
+    columns = [["a_X", "a_Y", "a_Z"], ["b"], ["c_X", "c_Y"]]
+    dfs = []
+    for cols in columns:
+        values = rng.normal(size=(len(date_range), len(cols)))
+        values[rng.random(values.shape) < 0.2] = np.nan
+        dfs.append(pd.DataFrame(values, index=date_range, columns=cols))
+    return dfs, columns, date_range
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_join_all_matches_merge(seed: int) -> None:
+    dfs, columns, date_range = loader_outputs(seed)
+    pd.testing.assert_frame_equal(
+        join_all(dfs, columns, date_range), merge_all(dfs, date_range)
+    )
+
+
+def test_join_all_aligns_outputs_on_the_range() -> None:
+    dfs, columns, date_range = loader_outputs(0)
+    # Rows in another order are put back on the bins they belong to
+    shuffled = [dfs[0], dfs[1].sample(frac=1, random_state=0), dfs[2]]
+    pd.testing.assert_frame_equal(
+        join_all(shuffled, columns, date_range), merge_all(dfs, date_range)
+    )
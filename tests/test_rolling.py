@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from fe.config import CENTRALITY_WINDOW_FUNS
+from fe.rolling import rolling_dominant_frequency, rolling_statistics
+
+
+def apply_statistics(df: pd.DataFrame, window: int) -> np.ndarray:
+    """Statistics as add_centrality_window used to compute them"""
+    return np.column_stack(
+        [
+            df[column].rolling(window=window).apply(fun)
+            for column in df.columns
+            for fun in CENTRALITY_WINDOW_FUNS
+        ]
+    )
+
+
+def fft_dominant_frequency(s: pd.Series, window_size: int, fs: int) -> pd.Series:
+    """Dominant frequency as the rolling `np.fft.fft` callback computed it"""
+    freqs = np.fft.fftfreq(window_size, d=1 / fs)
+    half_freqs = freqs[: window_size // 2]
+
+    def freq_with_max_amplitude(window):
+        if len(window) < window_size:
+            return np.nan
+        fft_vals = np.fft.fft(window)
+        half_fft_vals = np.abs(fft_vals[: window_size // 2])
+        return half_freqs[np.argmax(half_fft_vals)]
+
+    return s.rolling(window=window_size).apply(freq_with_max_amplitude, raw=True)
+
+
+def feature_block(seed: int) -> pd.DataFrame:
+    """A few columns with NaN here and there, and a run of them"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(300, 3)), columns=["a", "b", "c"])
+    df.iloc[rng.choice(len(df), 10, replace=False), 0] = np.nan
+    df.iloc[100:130, 1] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("window", [1, 10, 15])
+@pytest.mark.parametrize("block_size", [7, 2**14])
+def test_rolling_statistics_matches_apply(
+    seed: int, window: int, block_size: int
+) -> None:
+    df = feature_block(seed)
+    np.testing.assert_allclose(
+        rolling_statistics(
+            df.to_numpy(), window, CENTRALITY_WINDOW_FUNS, block_size=block_size
+        ),
+        apply_statistics(df, window),
+        rtol=1e-12,
+        atol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("n_rows", [1, 20, 299])
+def test_rolling_statistics_of_last_rows(n_rows: int) -> None:
+    df = feature_block(0)
+    out = np.empty((n_rows, df.shape[1] * len(CENTRALITY_WINDOW_FUNS)))
+    rolling_statistics(df.to_numpy(), 15, CENTRALITY_WINDOW_FUNS, out=out)
+    np.testing.assert_allclose(
+        out, apply_statistics(df, 15)[-n_rows:], rtol=1e-12, atol=1e-12
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("window", [2, 10, 15])
+@pytest.mark.parametrize("block_size", [7, 2**14])
+def test_rolling_dominant_frequency_matches_fft(
+    seed: int, window: int, block_size: int
+) -> None:
+    df = feature_block(seed)
+    expected = np.column_stack(
+        [fft_dominant_frequency(df[column], window, 100) for column in df.columns]
+    )
+    np.testing.assert_array_equal(
+        rolling_dominant_frequency(df.to_numpy(), window, 100, block_size=block_size),
+        expected,
+    )
+
+
+def test_rolling_dominant_frequency_of_last_rows() -> None:
+    df = feature_block(0)
+    out = np.empty((20, df.shape[1]))
+    rolling_dominant_frequency(df.to_numpy(), 15, 100, out=out)
+    expected = np.column_stack(
+        [fft_dominant_frequency(df[column], 15, 100) for column in df.columns]
+    )
+    np.testing.assert_array_equal(out, expected[-20:])
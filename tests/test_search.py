@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from sklearn.model_selection import GridSearchCV, KFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from models.knn.neighbors import NeighborsRegressor
+from models.knn.search import NeighborsGridSearchCV
+
+PARAM_GRID = {
+    "n_neighbors": [1, 3, 5, 8],
+    "weights": ["uniform", "distance"],
+    "metric": ["euclidean", "manhattan"],
+}
+
+
+def regression_data(seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(120, 4))
+    y = X @ rng.normal(size=4) + rng.normal(scale=0.1, size=120)
+    return X, y
+
+
+def assert_same_results(searches: list) -> None:
+    ours, theirs = (search.cv_results_ for search in searches)
+    assert ours["params"] == theirs["params"]
+    np.testing.assert_allclose(ours["mean_test_score"], theirs["mean_test_score"])
+    np.testing.assert_allclose(ours["std_test_score"], theirs["std_test_score"])
+    np.testing.assert_array_equal(ours["rank_test_score"], theirs["rank_test_score"])
+    assert searches[0].best_params_ == searches[1].best_params_
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_grid_search_matches_sklearn(seed: int) -> None:
+    X, y = regression_data(seed)
+    cv = KFold(5, shuffle=True, random_state=seed)
+    estimator = NeighborsRegressor()
+    assert_same_results(
+        [
+            NeighborsGridSearchCV(estimator, PARAM_GRID, cv=cv).fit(X, y),
+            GridSearchCV(
+                estimator, PARAM_GRID, cv=cv, scoring="neg_mean_squared_error"
+            ).fit(X, y),
+        ]
+    )
+
+
+def test_grid_search_of_pipeline_matches_sklearn() -> None:
+    X, y = regression_data(0)
+    estimator = Pipeline(
+        [("scale", StandardScaler()), ("model", NeighborsRegressor(float32=True))]
+    )
+    param_grid = {f"model__{name}": values for name, values in PARAM_GRID.items()}
+    assert_same_results(
+        [
+            NeighborsGridSearchCV(estimator, param_grid, cv=5).fit(X, y),
+            GridSearchCV(
+                estimator, param_grid, cv=5, scoring="neg_mean_squared_error"
+            ).fit(X, y),
+        ]
+    )
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from preprocessing.store import SensorStore
+
+
+def sensor_chunks(n_chunks: int = 3) -> list[pd.DataFrame]:
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-05-01 10:00", periods=300 * n_chunks, freq="700ms")
+    df = pd.DataFrame(
+        rng.normal(size=(len(index), 2)),
+        index=pd.DatetimeIndex(index, name="Time").as_unit("ns"),
+        columns=["x", "y"],
+    )
+    return [df.iloc[i : i + 300] for i in range(0, len(df), 300)]
+
+
+def test_store_reads_back_time_ranges(tmp_path) -> None:
+    chunks = sensor_chunks()
+    store = SensorStore(str(tmp_path / "store"))
+    store.write("sensor", chunks)
+
+    df = pd.concat(chunks)
+    start, end = df.index[100], df.index[700]
+    pd.testing.assert_frame_equal(store.read("sensor"), df, check_freq=False)
+    pd.testing.assert_frame_equal(
+        store.read("sensor", start=start, end=end),
+        df.loc[start : end - pd.Timedelta(1)],
+        check_freq=False,
+    )
+
+
+def test_store_knows_the_time_file_it_was_built_with(tmp_path) -> None:
+    time_path = tmp_path / "time.csv"
+    time_path.write_text("event,experiment time,system time text\n")
+    store = SensorStore(str(tmp_path / "store"))
+    store.write("sensor", sensor_chunks(), time_path=str(time_path))
+    store.write("unknown", sensor_chunks())
+    assert store.is_current("sensor", str(time_path))
+    assert not store.is_current("unknown", str(time_path))
+
+    time_path.write_text("event,experiment time,system time text\nSTART,0,\n")
+    os.utime(time_path, ns=(0, 0))
+    assert not store.is_current("sensor", str(time_path))
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing.aggregation import aggregate_bins, get_last, median
+from preprocessing.time_parser import TimeParser
+
+TIME_CSV = """event,experiment time,system time text
+START,0,2024-05-01 10:00:00.000 UTC+02:00
+PAUSE,300,2024-05-01 10:05:00.000 UTC+02:00
+START,360,2024-05-01 10:06:00.000 UTC+02:00
+PAUSE,700.5,2024-05-01 10:11:40.500 UTC+02:00
+START,760,2024-05-01 10:12:40.000 UTC+02:00
+PAUSE,1000,2024-05-01 10:16:40.000 UTC+02:00
+"""
+
+
+def loop_parse_times(time_parser: TimeParser, timekeys: pd.Series) -> pd.Series:
+    """Times as they used to be parsed, one mask per interval"""
+    timekeys = pd.to_timedelta(timekeys, unit="s")
+    return pd.concat(
+        timekeys[(timekeys >= interval.start.exp) & (timekeys < interval.end.exp)]
+        + (interval.start.real - interval.start.exp)
+        for interval in time_parser.intervals
+    )
+
+
+@pytest.fixture
+def time_parser(tmp_path) -> TimeParser:
+    (tmp_path / TimeParser.FILENAME).write_text(TIME_CSV)
+    return TimeParser(str(tmp_path))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_parse_times_matches_loop(time_parser: TimeParser, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    # Out of order, on the interval edges, in the pauses, out of range and NaN
+    keys = np.concatenate(
+        [
+            rng.uniform(-50, 1050, size=500),
+            [0, 300, 360, 700.5, 760, 1000, -1, 1001],
+            [np.nan] * 5,
+        ]
+    )
+    rng.shuffle(keys)
+    timekeys = pd.Series(keys, index=rng.permutation(len(keys)), name="Time (s)")
+
+    pd.testing.assert_series_equal(
+        time_parser.parse_times(timekeys), loop_parse_times(time_parser, timekeys)
+    )
+
+
+@pytest.mark.parametrize("freq", ["1s", "7s", "250ms"])
+def test_interval_bins_match_full_range(time_parser: TimeParser, freq: str) -> None:
+    rng = np.random.default_rng(0)
+    keys = pd.Series(np.sort(rng.uniform(0, 1000, size=5000)))
+    times = time_parser.parse_times(keys)
+    df = pd.DataFrame(
+        rng.normal(size=(len(times), 2)),
+        index=pd.DatetimeIndex(times),
+        columns=["x", "y"],
+    ).sort_index(kind="stable")
+    column_function_map = {"x": median, "y": get_last}
+
+    # Every bin the full range has samples in, as clean() keeps them
+    full_range = pd.date_range(time_parser.start, time_parser.end, freq=freq)
+    expected = aggregate_bins(df, column_function_map, full_range).dropna(how="all")
+    date_range = time_parser.interval_date_range(freq)
+    res = aggregate_bins(df, column_function_map, date_range, pd.Timedelta(freq))
+
+    # Pauses get no bins, yet no bin with samples is left out
+    assert len(date_range) < len(full_range) - 1
+    assert expected.index.isin(date_range).all()
+    pd.testing.assert_frame_equal(res.dropna(how="all"), expected, check_freq=False)
@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+__all__ = (
+    "COLUMNS_SUFFIX",
+    "append_frame",
+    "read_frame",
+    "read_last_row",
+    "write_frame",
+)
+
+# Frames are written as CSV unless the path has this suffix
+COLUMNS_SUFFIX = ".cols"
+SCHEMA = "schema.json"
+
+
+def is_columnar(path: str | Path) -> bool:
+    return Path(path).suffix == COLUMNS_SUFFIX
+
+
+def to_float32(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype(
+        {col: np.float32 for col, dtype in df.dtypes.items() if dtype == np.float64}
+    )
+
+
+def read_frame(
+    path: str | Path, columns: list[str] | None = None, mmap: bool = True
+) -> pd.DataFrame:
+    """
+    Frame written by `write_frame`, just its `columns` if given. Columnar
+    files are memory mapped unless `mmap` is False, so the columns are only
+    read from disk as they are used (and they are read only)
+    """
+    if not is_columnar(path):
+        df = pd.read_csv(path, usecols=columns)
+        return df if columns is None else df[columns]
+
+    path = Path(path)
+    with open(path / SCHEMA) as f:
+        schema = json.load(f)
+    files = dict(schema["columns"])
+    if columns is None:
+        columns = list(files)
+    missing = set(columns).difference(files)
+    if missing:
+        raise ValueError(f"Columns {sorted(missing)} are not in {path}")
+
+    return pd.DataFrame(
+        {
+            column: np.load(path / files[column], mmap_mode="r" if mmap else None)
+            for column in columns
+        },
+        copy=False,
+    )
+
+
+def write_frame(df: pd.DataFrame, path: str | Path, float32: bool = False) -> None:
+    """
+    Write `df` as CSV, or as a directory with a `.npy` file per column (typed,
+    memory mappable) if `path` ends with `COLUMNS_SUFFIX`. With `float32`
+    every float column is written in single precision
+    """
+    if float32:
+        df = to_float32(df)
+    if not is_columnar(path):
+        df.to_csv(path, index=False)
+        return
+
+    # Written somewhere else first so readers never see half a frame
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+    files = []
+    for i, (column, values) in enumerate(df.items()):
+        values = values.to_numpy()
+        if values.dtype == object:
+            # Not memory mappable, f.e. times read from a CSV
+            values = values.astype(str)
+        np.save(tmp / f"{i}.npy", values, allow_pickle=False)
+        files.append((column, f"{i}.npy"))
+    with open(tmp / SCHEMA, "w") as f:
+        json.dump({"rows": len(df), "columns": files}, f)
+
+    if path.exists():
+        old = path.with_name(f"{path.name}.{os.getpid()}.old")
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, path)
+
+
+def append_frame(df: pd.DataFrame, path: str | Path, float32: bool = False) -> None:
+    """Add the rows of `df` at the end of the frame at `path`"""
+    if not is_columnar(path):
+        if float32:
+            df = to_float32(df)
+        df.to_csv(path, index=False, mode="a", header=False)
+        return
+    # Columns are single arrays, so they are written again
+    old = read_frame(path, mmap=False)
+    write_frame(pd.concat([old, df], ignore_index=True), path, float32=float32)
+
+
+def read_last_row(path: str | Path, block_size: int = 2**16) -> pd.DataFrame:
+    """Last row of a frame (with every column), reading just the end of it"""
+    if is_columnar(path):
+        return read_frame(path).iloc[-1:]
+
+    with open(path, "rb") as f:
+        header = f.readline()
+        end = f.seek(0, os.SEEK_END)
+        while True:
+            start = max(end - block_size, len(header))
+            f.seek(start)
+            lines = f.read(end - start).splitlines()
+            # Unless it's all of the file, the first line may be cut
+            if len(lines) > 1 or start == len(header):
+                break
+            block_size *= 2
+    return pd.read_csv(io.BytesIO(header + (lines[-1] if lines else b"")))
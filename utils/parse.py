@@ -4,8 +4,14 @@ import os
 from dataclasses import dataclass
 from pathlib import Path
 
+from models.base import CACHE_DIR
 
 ############################## BASE PARSING ##############################
+# Help of the frames read and written with `utils.frames`
+FRAME_INPUT_HELP = "Input file path, read as a columnar frame if it ends with .cols"
+FRAME_OUTPUT_HELP = "Output file path, written as a columnar frame if it ends with .cols and as CSV otherwise"
+
+
 @dataclass
 class BaseArgs:
     input: Path
@@ -13,7 +19,10 @@ class BaseArgs:
 
 
 def get_base_parser(
-    default_in_path: str, default_out_path: str
+    default_in_path: str,
+    default_out_path: str,
+    input_help: str = "Input file path",
+    output_help: str = "Output file path",
 ) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(add_help=False)
     group = parser.add_argument_group(title="I/O files argument handling")
@@ -21,7 +30,7 @@ def get_base_parser(
         "-i",
         # "--input",
         type=parse_input_path,
-        help="Input file path (default: %(default)s)",
+        help=f"{input_help} (default: %(default)s)",
         default=default_in_path,
         metavar="INPUT_PATH",
         dest="input",
@@ -30,7 +39,7 @@ def get_base_parser(
         "-o",
         # "--output",
         type=parse_output_path,
-        help="Output file path (default: %(default)s)",
+        help=f"{output_help} (default: %(default)s)",
         default=default_out_path,
         metavar="OUTPUT_PATH",
         dest="output",
@@ -60,12 +69,35 @@ def parse_output_path(_path) -> Path:
 
 ############################## MODEL PARSING ##############################
 @dataclass
-class GridArgs(BaseArgs):
+class ModelArgs(BaseArgs):
+    k: int | str
+    cache: str | None
+
+
+@dataclass
+class GridArgs(ModelArgs):
     file: str
+    jobs: int
 
 
 def parse_grid(args: argparse.Namespace) -> GridArgs:
-    return GridArgs(args.input, args.output, args.file)
+    return GridArgs(args.input, args.output, args.k, args.cache, args.file, args.jobs)
+
+
+def parse_k(_k) -> int | str:
+    return _k if _k == "all" else int(_k)
+
+
+def get_model_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_argument_group(title="Pipeline argument handling")
+    group.add_argument(
+        "-k",
+        type=parse_k,
+        default=15,
+        help="Number of features to select, or 'all' (default: %(default)s)",
+    )
+    return parser
 
 
 def get_grid_and_single_subparsers(
@@ -74,20 +106,41 @@ def get_grid_and_single_subparsers(
 ) -> tuple[argparse.ArgumentParser, argparse.ArgumentParser]:
     # Complicated trick to know where this is been called from
     _from_file = inspect.currentframe().f_back.f_globals["__file__"]
+    model_parser = get_model_parser()
     # Add subparsers to parser
     subparsers = parser.add_subparsers(dest="command")
     # Grid suparser
     grid_subparser = subparsers.add_parser(
         "grid",
         description="Perform a search over parameter grid to find best parameters for the model",
-        parents=[base_parser],
+        parents=[base_parser, model_parser],
     )
     grid_subparser.add_argument(
         "-f",
         "--file",
         type=argparse.FileType("r"),
         default=os.path.join(os.path.dirname(_from_file), "params.json"),
-        help=".json file with parameter grid",
+        help=".json file with parameter grid, 'select__k' searches over the number of features",
+    )
+    grid_subparser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes fitting folds and parameters at once, -1 for all CPUs (default: %(default)s)",
+    )
+    grid_subparser.add_argument(
+        "--cache",
+        type=str,
+        default=CACHE_DIR,
+        help="Directory keeping the fitted scaler and selector of every fold, its least recently used ones are dropped past a size limit (default: %(default)s)",
+    )
+    grid_subparser.add_argument(
+        "--no-cache",
+        action="store_const",
+        const=None,
+        dest="cache",
+        help="Don't keep the fitted scaler and selector",
     )
     grid_subparser.set_defaults(fun=parse_grid)
 
@@ -95,7 +148,9 @@ def get_grid_and_single_subparsers(
     single_subparser = subparsers.add_parser(
         "single",
         description="Fit model and make predictions with given hyper-parameters",
-        parents=[base_parser],
+        parents=[base_parser, model_parser],
     )
+    # A single fit, nothing to cache
+    single_subparser.set_defaults(cache=None)
 
     return (grid_subparser, single_subparser)